@@ -1,8 +1,13 @@
 import bpy 
 import random 
 import math 
-import mathutils as m 
+import os
 import pickle 
+import sys
+
+QUICK_ANIMATION_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'QuickAnimation')
+sys.path.append(QUICK_ANIMATION_FOLDER)
+from BlenderKeys import reset_pose, key_bones
 
 curve_dico = {0: 'LocX',
 			  1: 'LocY',
@@ -13,10 +18,6 @@ curve_dico = {0: 'LocX',
 			  6: 'RotZ'
 			  }
 
-def set_frame(nb): 
-	bpy.context.scene.frame_current = nb
-
-
 def Load(path_to_data, armature, name): 
 
 	curves = pickle.load(open(path_to_data, 'rb'))
@@ -36,36 +37,31 @@ def Load(path_to_data, armature, name):
 	print('Curves: {} -- Bones {}'.format(len(curves), len(curves)/7))
 	
 	armature.create_action(name)
-	source_curves = armature.get_curves()
+	action = armature.armature.animation_data.action
 	
-	# reset all 
-	bpy.ops.pose.select_all(action = 'SELECT')
-	bpy.ops.pose.loc_clear()
-	bpy.ops.pose.rot_clear()
-
-	set_frame(0)
-
-	# Add one frame for curves 
-
-	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = True)
+	# reset all, without touching the selection. Bones the file has no curves for get a rest key on frame 0.
+	reset_pose(armature.armature)
+	key_bones(armature.armature, all_bones[int(len(curves)/7):], 0)
 
-	# add frames for each curve 
+	# Curves are created directly, with all their keys at once: no frame change, no keyframe_insert_menu.
+	# 7 curves per bone: location, then quaternion.
 
-	for i in range(len(armature.bones_names)): 
-		index = i*7 # make sure to iterate well (7 curves per bone)
-		keyframes = curves[index].frames
-		name = armature.select_index(i)   # select bone for adding frames for the 7 curves in the same time 
+	created = []
+	for courbe, c_t in enumerate(curves[:len(all_bones)*7]): 
+		current_bone = all_bones[int(courbe/7)]
+		if courbe%7 <3: 
+			path, index = 'location', courbe%7
+		else: 
+			path, index = 'rotation_quaternion', courbe%7 - 3
 
-		for k in keyframes: 
-			set_frame(k)
-			bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__')
-			# print('Bone {} - Adding keyframe {} '.format(name, k))
+		c_s = action.fcurves.new('pose.bones["{}"].{}'.format(current_bone, path), index = index, action_group = current_bone)
+		c_s.keyframe_points.add(len(c_t.points))
+		created.append(c_s)
 
-	# Flat curves are set up. 
-	# Now, time to move the control points and handles 
+	# Now, time to fill the control points and handles, one flat list per attribute 
 
 	courbe = 0 
-	for c_s, c_t in zip(source_curves, curves): 
+	for c_s, c_t in zip(created, curves): 
 		ratio = 1.
 		current_bone = all_bones[int(courbe/7)]
 		if courbe%7 <3: 
@@ -74,19 +70,14 @@ def Load(path_to_data, armature, name):
 			elif current_bone in armature.arm_sensitive: 
 				ratio = current_arm_length
 
+		co, left, right = [], [], []
+		for ref in c_t.points:
+			co += [c*ratio for c in ref.point]
+			left += [c*ratio for c in ref.left_handle]
+			right += [c*ratio for c in ref.right_handle]
 
-		for idx,kf in enumerate(c_s.keyframe_points):
-			# print('Courbe {} -- Point {} '.format(courbe, idx))
-			ref = c_t.points[idx]
-			kf.co.y = ref.point[1]*ratio
-			kf.handle_left = m.Vector(ref.left_handle)
-			kf.handle_right = m.Vector(ref.right_handle)
-
-			kf.handle_left.y *= ratio
-			kf.handle_right.y *= ratio
-			kf.handle_left.x *= ratio
-			kf.handle_right.x *= ratio
-
-
-		courbe += 1 
+		c_s.keyframe_points.foreach_set('co', co)
+		c_s.keyframe_points.foreach_set('handle_left', left)
+		c_s.keyframe_points.foreach_set('handle_right', right)
 
+		courbe += 1
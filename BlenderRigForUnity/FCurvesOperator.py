@@ -256,7 +256,12 @@ class DialogOperator(bpy.types.Operator):
         save_all(curves, source_armature,full_path)
 
 
-bpy.utils.register_class(DialogOperator)
+def register(): 
+    bpy.utils.register_class(DialogOperator)
 
-# test call
-bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test')
\ No newline at end of file
+
+if __name__ == '__main__': 
+    register()
+
+    # test call
+    bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test')
\ No newline at end of file
@@ -0,0 +1,132 @@
+import mathutils as m
+
+from collections import OrderedDict
+
+# In-memory pose of an armature for the procedural scripts. translate and rotate do what bpy.ops.transform.translate
+# and rotate do on the active bone (global space, pivot on the bone's head), key stores the pose at a frame,
+# write puts all the keys of each action in its f-curves at once. No operator, no selection, no frame change.
+#
+# Pose matrices are rebuilt from the bases and the parents, as Blender does for bones without constraints
+# (the controllers moved by the clips: feet, IK targets, pelvis and spine).
+
+rotation_paths = {'QUATERNION':'rotation_quaternion', 'AXIS_ANGLE':'rotation_axis_angle'}
+
+
+def rotation_path(mode):
+	return rotation_paths.get(mode, 'rotation_euler')
+
+def rotation_values(rotation, mode, previous = None):
+
+	# Values of a quaternion in the bone's rotation mode, kept continuous with the previous key.
+	if mode == 'QUATERNION':
+		q = rotation.copy()
+		if previous is not None and q.dot(previous) < 0.:
+			q.negate()
+		return q
+	if mode == 'AXIS_ANGLE':
+		axis, angle = rotation.to_axis_angle()
+		return m.Vector((angle, axis.x, axis.y, axis.z))
+	if previous is not None:
+		return rotation.to_euler(mode, previous)
+	return rotation.to_euler(mode)
+
+
+class PoseBuffer():
+
+	def __init__(self, armature):
+
+		self.armature = armature
+		self.world = armature.matrix_world.to_3x3()
+
+		# Rest transform of each bone in its parent's space
+		self.parents = {}
+		self.offsets = {}
+		for bone in armature.data.bones:
+			local = m.Matrix(bone.matrix_local)
+			self.parents[bone.name] = bone.parent.name if bone.parent else None
+			self.offsets[bone.name] = m.Matrix(bone.parent.matrix_local).inverted()*local if bone.parent else local
+
+		self.keys = OrderedDict() # action: {frame: {bone: basis}}
+		self.reset()
+
+	def reset(self):
+		self.basis = {name:m.Matrix.Identity(4) for name in self.offsets}
+
+	def matrix(self, name):
+
+		# Armature space matrix of a bone (pose_bone.matrix)
+		matrix = self.offsets[name]*self.basis[name]
+		parent = self.parents[name]
+		return self.matrix(parent)*matrix if parent else matrix
+
+	def set_matrix(self, name, matrix):
+
+		parent = self.parents[name]
+		rest = self.matrix(parent)*self.offsets[name] if parent else self.offsets[name]
+		self.basis[name] = rest.inverted()*matrix
+
+	def translate(self, name, vector):
+
+		matrix = self.matrix(name)
+		matrix.translation = matrix.translation + self.world.inverted()*m.Vector(vector)
+		self.set_matrix(name, matrix)
+
+	def rotate(self, name, quaternion):
+
+		world = self.world.to_quaternion()
+		rotation = (world.inverted()*quaternion.normalized()*world).to_matrix().to_4x4()
+		matrix = self.matrix(name)
+		head = matrix.translation.copy()
+		matrix = rotation*matrix
+		matrix.translation = head
+		self.set_matrix(name, matrix)
+
+	def key(self, frame):
+
+		# Pose of every bone, in the armature's current action. Keying a frame twice keeps the last pose.
+		action = self.armature.animation_data.action
+		self.keys.setdefault(action, {})[frame] = {name:basis.copy() for name, basis in self.basis.items()}
+
+	def write(self):
+
+		for action, poses in self.keys.items():
+			self.write_action(action, poses)
+		print('Wrote {} actions'.format(len(self.keys)))
+		self.keys.clear()
+
+	def write_action(self, action, poses):
+
+		frames = sorted(poses)
+		curves = []
+		for pose_bone in self.armature.pose.bones:
+			name = pose_bone.name
+			locations = []
+			rotations = []
+			for frame in frames:
+				location, rotation, scale = poses[frame][name].decompose()
+				previous = rotations[-1] if rotations else None
+				locations.append(location)
+				rotations.append(rotation_values(rotation, pose_bone.rotation_mode, previous))
+
+			for data_path, values in [('location', locations), (rotation_path(pose_bone.rotation_mode), rotations)]:
+				for index in range(len(values[0])):
+					co = []
+					for frame, v in zip(frames, values):
+						co += [frame, v[index]]
+					curves.append((name, data_path, index, co))
+
+		# Curves replaced, all allocated, then filled with one foreach_set each.
+		paths = set(('pose.bones["{}"].{}'.format(name, data_path), index) for name, data_path, index, co in curves)
+		for c in [c for c in action.fcurves if (c.data_path, c.array_index) in paths]:
+			action.fcurves.remove(c)
+
+		created = []
+		for name, data_path, index, co in curves:
+			c = action.fcurves.new('pose.bones["{}"].{}'.format(name, data_path), index = index, action_group = name)
+			c.keyframe_points.add(len(frames))
+			created.append((c, co))
+
+		# update() gives the keys the auto clamped handles keyframe_insert_menu would have.
+		for c, co in created:
+			c.keyframe_points.foreach_set('co', co)
+			c.update()
@@ -0,0 +1,116 @@
+import bpy
+import numpy as np
+
+from PoseTable import MOVE, ROTATE
+
+# print_pose for a whole action at once: the twelve Skeleton entries are read once per key frame (one frame_set each,
+# so constraints are evaluated as when stepping by hand), then the moves and rotations print_pose would print
+# are computed for all keys together. The result is a pose table clip, see PoseTable.py.
+
+leg_entries = ['footL', 'footR']
+arm_entries = ['armL', 'armR', 'targetLL', 'targetLR', 'targetAL', 'targetAR']
+spine_parents = {'spine1':'pelvis', 'spine2':'spine1', 'head':'spine2'}
+
+# Rotation print_pose measures the pelvis from (the rig's pelvis points forward at rest)
+pelvis_rest = np.array([0.7071, 0.7071, 0., 0.])
+
+
+def matrix_quaternions(m):
+
+	# (n, 4, 4) pose matrices to (n, 4) quaternions (w, x, y, z) of their rotation, as Matrix.to_quaternion
+	r = m[:, :3, :3]/np.linalg.norm(m[:, :3, :3], axis = 1)[:, None, :]
+	trace = r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2]
+	candidates = np.stack([
+		np.stack([1. + trace, r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0], r[:, 1, 0] - r[:, 0, 1]], -1),
+		np.stack([r[:, 2, 1] - r[:, 1, 2], 1. + r[:, 0, 0] - r[:, 1, 1] - r[:, 2, 2], r[:, 0, 1] + r[:, 1, 0], r[:, 0, 2] + r[:, 2, 0]], -1),
+		np.stack([r[:, 0, 2] - r[:, 2, 0], r[:, 0, 1] + r[:, 1, 0], 1. - r[:, 0, 0] + r[:, 1, 1] - r[:, 2, 2], r[:, 1, 2] + r[:, 2, 1]], -1),
+		np.stack([r[:, 1, 0] - r[:, 0, 1], r[:, 0, 2] + r[:, 2, 0], r[:, 1, 2] + r[:, 2, 1], 1. - r[:, 0, 0] - r[:, 1, 1] + r[:, 2, 2]], -1)], 1)
+	best = np.argmax(np.stack([trace, r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]], -1), axis = 1)
+	q = candidates[np.arange(len(r)), best]
+	q /= np.linalg.norm(q, axis = 1)[:, None]
+	q[q[:, 0] < 0.] *= -1.
+	return q
+
+def quaternion_products(a, b):
+
+	a, b = np.broadcast_arrays(a, b)
+	w1, x1, y1, z1 = a.T
+	w2, x2, y2, z2 = b.T
+	return np.stack([w1*w2 - x1*x2 - y1*y2 - z1*z2, w1*x2 + x1*w2 + y1*z2 - z1*y2,
+		w1*y2 - x1*z2 + y1*w2 + z1*x2, w1*z2 + x1*y2 - y1*x2 + z1*w2], -1)
+
+def inverted(q):
+	return q*np.array([1., -1., -1., -1.])/np.sum(q*q, axis = -1, keepdims = True)
+
+def action_frames(action, bones):
+
+	# Key frames of the curves animating the bones
+	frames = []
+	for c in action.fcurves:
+		if any('"{}"'.format(b) in c.data_path for b in bones):
+			co = np.empty(2*len(c.keyframe_points))
+			c.keyframe_points.foreach_get('co', co)
+			frames.append(co[0::2])
+	return np.unique(np.concatenate(frames)) if frames else np.zeros(0)
+
+def pose_matrices(armature, bones, frames):
+
+	# (n frames, n bones, 4, 4) armature space matrices, one scene update per frame
+	scene = bpy.context.scene
+	current = scene.frame_current
+	matrices = np.empty((len(frames), len(bones), 4, 4))
+	for i, frame in enumerate(frames):
+		scene.frame_set(int(frame))
+		for j, name in enumerate(bones):
+			matrices[i, j] = np.array(armature.pose.bones[name].matrix)
+	scene.frame_set(current)
+	return matrices
+
+def entry_moves(entry, matrices, initial, leg_length, arm_length):
+
+	# [(kind, values, kept)] of one entry in print_pose's order: values (n, 3 or 4), kept (n,) where print_pose prints.
+	current = matrices[entry]
+	moves = []
+	translation = current[:, :3, 3] - initial[entry][:3, 3]
+	distance = np.linalg.norm(translation, axis = 1)
+
+	if entry in leg_entries:
+		moves.append((MOVE, translation/leg_length, distance > 0.001))
+		new = matrix_quaternions(current)
+		old = matrix_quaternions(initial[entry][None])
+		moves.append((ROTATE, quaternion_products(new, inverted(old)), np.any(new != old, axis = 1)))
+	elif entry in arm_entries:
+		moves.append((MOVE, translation/arm_length, distance > 0.001))
+	elif entry == 'pelvis':
+		new = matrix_quaternions(current)
+		rotation = quaternion_products(inverted(pelvis_rest), new)
+		moves.append((ROTATE, rotation[:, [0, 1, 3, 2]], np.any(new != pelvis_rest, axis = 1)))
+		moves.append((MOVE, translation/leg_length, distance > 0.05))
+	else:
+		new = matrix_quaternions(current)
+		old = matrix_quaternions(matrices[spine_parents[entry]])
+		rotation = quaternion_products(new, inverted(old))
+		rotation /= np.linalg.norm(rotation, axis = 1)[:, None]
+		moves.append((ROTATE, rotation, np.any(new != old, axis = 1)))
+	return moves
+
+def capture_action(skeleton, action, frames = None):
+
+	# [(frame, [(entry, kind, values)])] of every key of the action (all the keys of the entries by default).
+	entries = list(skeleton.dico.keys())
+	bones = [skeleton.dico[e].name for e in entries]
+	frames = action_frames(action, bones) if frames is None else np.asarray(frames)
+
+	previous = skeleton.armature.animation_data.action
+	skeleton.armature.animation_data.action = action
+	poses = pose_matrices(skeleton.armature, bones, frames)
+	skeleton.armature.animation_data.action = previous
+
+	matrices = {e:poses[:, i] for i, e in enumerate(entries)}
+	initial = {e:np.array(skeleton.initial_pose[e]) for e in entries}
+	columns = [(e, kind, values, kept) for e in entries for kind, values, kept in entry_moves(e, matrices, initial, skeleton.leg_length, skeleton.arm_length)]
+
+	keys = []
+	for i, frame in enumerate(frames):
+		keys.append((int(frame), [(e, kind, values[i].tolist()) for e, kind, values, kept in columns if kept[i]]))
+	return keys
@@ -0,0 +1,229 @@
+import argparse
+import ast
+import json
+import os
+import struct
+
+from collections import OrderedDict
+
+import numpy as np
+
+# Procedural clips as data: for every key of every action, the moves and rotations of the Skeleton entries
+# (footL, pelvis, targetAR... see ProceduralAnimv2.Skeleton.dico), unscaled as in the old methods.
+#
+#   magic | version | index length | index (json) | clip payloads
+#
+# index = {'bones': entry names, 'clips': {clip: {'offset', 'count', 'actions': [{'name', 'frames'}], 'bones'}}}
+# A clip payload is count OP records. Keys are numbered across the actions of a clip, in order.
+# Only the header and the index are read when the table is opened, a clip's records when it is first played.
+
+MAGIC = b'PPOSE'
+VERSION = 1
+HEADER = struct.Struct('<5sBI')
+
+MOVE = 0
+ROTATE = 1
+OP = np.dtype([('key', '<u2'), ('bone', 'u1'), ('kind', 'u1'), ('values', '<f4', (4,))])
+
+bone_entries = ['footL', 'footR', 'armL', 'armR', 'pelvis', 'spine1', 'spine2', 'head', 'targetLL', 'targetLR', 'targetAL', 'targetAR']
+
+
+def call_name(node):
+
+	# 'self.move', 'set_frame', 'bpy.data.actions.new'... of a call node
+	parts = []
+	node = node.func
+	while isinstance(node, ast.Attribute):
+		parts.append(node.attr)
+		node = node.value
+	if isinstance(node, ast.Name):
+		parts.append(node.id)
+	return '.'.join(parts[::-1])
+
+def parse_method(method):
+
+	# [(action name, [(frame, [(entry, kind, values)])])] of a clip method, statement by statement.
+	actions = []
+	frame = 0
+	pending = []
+	for statement in method.body:
+		if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Call) and call_name(statement.value).endswith('actions.new'):
+			name = [ast.literal_eval(k.value) for k in statement.value.keywords if k.arg == 'name']
+			actions.append((name[0] if name else ast.literal_eval(statement.value.args[0]), []))
+			continue
+
+		if not isinstance(statement, ast.Expr) or not isinstance(statement.value, ast.Call):
+			raise ValueError('Line {}: not a clip statement'.format(statement.lineno))
+		call = statement.value
+		name = call_name(call)
+		if name == 'set_frame':
+			frame = ast.literal_eval(call.args[0])
+		elif name == 'add_frames':
+			frame += ast.literal_eval(call.args[0])
+		elif name == 'self.reset_all':
+			pending = []
+		elif name in ['self.move', 'self.rotate']:
+			values = list(ast.literal_eval(call.args[1].args[0]))
+			pending.append((ast.literal_eval(call.args[0]), MOVE if name == 'self.move' else ROTATE, values))
+		elif name == 'self.confirm_animation_pose':
+			actions[-1][1].append((frame, pending))
+			pending = []
+		elif name != 'self.armature.animation_data_create':
+			raise ValueError('Line {}: unexpected call {}'.format(statement.lineno, name))
+
+	return actions
+
+def creates_action(method):
+	return any(isinstance(n, ast.Call) and call_name(n).endswith('actions.new') for n in ast.walk(method))
+
+def parse_source(path, class_name = 'Skeleton'):
+
+	# {clip: actions} of the hard-coded clip methods of a script (the methods creating an action).
+	tree = ast.parse(open(path).read())
+	clips = OrderedDict()
+	for node in tree.body:
+		if isinstance(node, ast.ClassDef) and node.name == class_name:
+			for method in node.body:
+				if isinstance(method, ast.FunctionDef) and creates_action(method):
+					clips[method.name] = parse_method(method)
+	return clips
+
+def encode_clip(actions):
+
+	# OP records and index entry of a clip
+	records = []
+	key = 0
+	for action, keys in actions:
+		for frame, moves in keys:
+			for entry, kind, values in moves:
+				records.append((key, bone_entries.index(entry), kind, tuple(values) + (0.,)*(4 - len(values))))
+			key += 1
+
+	info = {
+		'count':len(records),
+		'actions':[{'name':action, 'frames':[frame for frame, moves in keys]} for action, keys in actions],
+		'bones':sorted(set(entry for action, keys in actions for frame, moves in keys for entry, kind, values in moves)),
+	}
+	return np.array(records, dtype = OP), info
+
+def write_table(clips, path):
+
+	index = OrderedDict([('bones', bone_entries), ('clips', OrderedDict())])
+	payloads = []
+	offset = 0
+	for name, actions in clips.items():
+		records, info = encode_clip(actions)
+		info['offset'] = offset
+		index['clips'][name] = info
+		payloads.append(records.tobytes())
+		offset += len(payloads[-1])
+
+	index = json.dumps(index, separators = (',', ':')).encode('utf-8')
+	with open(path, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+		f.write(index)
+		for payload in payloads:
+			f.write(payload)
+
+	print('Wrote {} clips into {}'.format(len(clips), path))
+	return path
+
+def add_clips(clips, path, replace = False):
+
+	# Writes the clips into an existing table, replacing the ones of the same name.
+	merged = OrderedDict()
+	if os.path.isfile(path) and not replace:
+		existing = PoseTable(path)
+		for name in existing.names():
+			merged[name] = existing.steps(name)
+	merged.update(clips)
+	return write_table(merged, path)
+
+
+class PoseTable():
+
+	def __init__(self, path):
+
+		self.path = path
+		with open(path, 'rb') as f:
+			magic, version, index_length = HEADER.unpack(f.read(HEADER.size))
+			if magic != MAGIC:
+				raise ValueError('Not a pose table: {}'.format(path))
+			if version != VERSION:
+				raise ValueError('Unsupported pose table version {}'.format(version))
+			index = json.loads(f.read(index_length).decode('utf-8'), object_pairs_hook = OrderedDict)
+
+		self.bones = index['bones']
+		self.index = index['clips']
+		self.data_start = HEADER.size + index_length
+		self.records = {}
+
+	def __contains__(self, name):
+		return name in self.index
+
+	def names(self):
+		return list(self.index.keys())
+
+	def entry(self, name):
+
+		if name not in self.index:
+			raise KeyError('No clip {} in {}'.format(name, self.path))
+		return self.index[name]
+
+	def find(self, bone = None, action = None):
+
+		# Clips moving a Skeleton entry and/or creating an action of that name, from the index alone.
+		found = []
+		for name, info in self.index.items():
+			if bone is not None and bone not in info['bones']:
+				continue
+			if action is not None and action not in [a['name'] for a in info['actions']]:
+				continue
+			found.append(name)
+		return found
+
+	def clip(self, name):
+
+		# OP records of a clip, read on first use.
+		if name not in self.records:
+			info = self.entry(name)
+			with open(self.path, 'rb') as f:
+				f.seek(self.data_start + info['offset'])
+				self.records[name] = np.frombuffer(f.read(info['count']*OP.itemsize), dtype = OP)
+		return self.records[name]
+
+	def steps(self, name):
+
+		# [(action name, [(frame, [(entry, kind, values)])])], what the old clip method did in order.
+		records = self.clip(name)
+		bounds = np.searchsorted(records['key'], np.arange(sum(len(a['frames']) for a in self.entry(name)['actions']) + 1))
+		actions = []
+		key = 0
+		for action in self.entry(name)['actions']:
+			keys = []
+			for frame in action['frames']:
+				moves = []
+				for r in records[bounds[key]:bounds[key + 1]]:
+					values = r['values'].tolist()
+					moves.append((self.bones[r['bone']], int(r['kind']), values[:3] if r['kind'] == MOVE else values))
+				keys.append((frame, moves))
+				key += 1
+			actions.append((action['name'], keys))
+		return actions
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Build or list a procedural pose table')
+	parser.add_argument('table', help = 'Pose table file')
+	parser.add_argument('--source', help = 'Script whose Skeleton clip methods are added to the table')
+	parser.add_argument('--replace', action = 'store_true', help = 'Drop the clips already in the table')
+	args = parser.parse_args()
+
+	if args.source:
+		add_clips(parse_source(args.source), args.table, args.replace)
+
+	table = PoseTable(args.table)
+	for name in table.names():
+		info = table.entry(name)
+		print('{}: {} ({} moves)'.format(name, ', '.join('{} {} keys'.format(a['name'], len(a['frames'])) for a in info['actions']), info['count']))
@@ -1,10 +1,25 @@
 import bpy 
 import mathutils as m
 import math 
+import os
 import pickle
+import sys
+
+from PoseBuffer import PoseBuffer
+
+QUICK_ANIMATION_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'QuickAnimation')
+sys.path.append(QUICK_ANIMATION_FOLDER)
+from RigProfile import rig_profile
+
+buffer = None # PoseBuffer while a Skeleton is recording
 
 def confirm_animation_pose(): 
 
+	if buffer is not None: 
+		buffer.key(bpy.context.scene.frame_current)
+		reset_all()
+		return 
+
 	bpy.ops.pose.select_all(action = 'SELECT')
 	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = True)
 	reset_all()
@@ -37,6 +52,10 @@ def set_frame(nb_frames):
 
 def reset_all(): 
 
+	if buffer is not None: 
+		buffer.reset()
+		return 
+
 	bpy.ops.pose.select_all(action = 'SELECT')
 	bpy.ops.pose.rot_clear()
 	bpy.ops.pose.loc_clear()
@@ -100,29 +119,18 @@ class Skeleton():
 			self.leg_length = params[1]
 
 		else:
-			reset_all()
-
-			to_be_pickled = {}
+			# From the rig's profile (RigProfile.py): the controllers' rest matrices are their pose at rest
+			profile = rig_profile(self.armature)
 			self.initial_pose = {}
-
-			self.arm_length = math.fabs(self.handR.head.x - self.shouR.head.x)
-			self.leg_length = math.fabs(self.legL.head.z - self.footL.head.z)
-
 			for b in self.bones:
+				self.initial_pose[b] = m.Matrix(profile.rest_matrix(self.bones[b].name).tolist())
 
-				pose = self.bones[b].matrix
-				to_be_pickled[b] = matrix_to_list(pose)
-				self.initial_pose[b] = pose
-
-
-			pickle.dump(to_be_pickled, open(self.path+'initial_pose', 'wb'))
-			params = [self.arm_length, self.leg_length]
-			pickle.dump(params, open(self.path+'parameters', 'wb'))
+			self.arm_length = math.fabs(profile.head_local('IK Arm R')[0] - profile.head_local('Upperarm R')[0])
+			self.leg_length = math.fabs(profile.head_local('Leg L')[2] - profile.head_local('Foot Control L')[2])
 
 	def move(self, bone_name, vec): 
 
 		bone = self.bones[bone_name]
-		self.set_active(bone)
 
 		factor = 1.
 		if bone_name in ['footL', 'footR', 'targetLL', 'targetLR', 'pelvis']: 
@@ -133,14 +141,36 @@ class Skeleton():
 
 		vec = vec.copy()*factor
 
+		if buffer is not None: 
+			buffer.translate(bone.name, vec)
+			return 
+
+		self.set_active(bone)
 		bpy.ops.transform.translate(value = vec)
 
 	def rotate(self, bone_name, quat): 
 
 		bone = self.bones[bone_name]
+		if buffer is not None: 
+			buffer.rotate(bone.name, quat)
+			return 
+
 		self.set_active(bone)
 		bpy.ops.transform.rotate(value = quat.angle, axis = quat.axis)
 
+	def record(self, *clips): 
+
+		# Same clips, keyed from an in-memory pose: no operator per move, one write per action at the end.
+		global buffer
+		# A failing clip must not leave the pose buffer in place of the operators.
+		buffer = PoseBuffer(self.armature)
+		try: 
+			for clip in clips: 
+				getattr(self, clip)()
+			buffer.write()
+		finally: 
+			buffer = None
+
 	def set_active(self, bone): 
 
 		bpy.ops.pose.select_all(action = 'DESELECT')
@@ -265,12 +295,14 @@ class Skeleton():
 
 
 
-print('\n'*30)
+if __name__ == '__main__': 
+
+	print('\n'*30)
 
 
-path = '/home/mehdi/Blender/Scripts/'
-skeleton = Skeleton(bpy.data.objects['Armature'], load = True,  path= path)
+	skeleton = Skeleton(bpy.data.objects['Armature'])
 
-# skeleton.test()
-skeleton.print_pose()
-# skeleton.get_rot()
\ No newline at end of file
+	# skeleton.test()
+	# skeleton.record('test')
+	skeleton.print_pose()
+	# skeleton.get_rot()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import bpy
+
+from RigSpec import expand_spec
+
+# Builds a rig from a spec (RigSpec.py) through the data API: the armature and its object are created directly,
+# the edit bones are all made in one edit mode session, then the constraints on the pose bones.
+# The only operators left are the mode switches edit bones and pose bones need.
+
+
+def new_rig(name, location = (0., 0., 0.)):
+
+	data = bpy.data.armatures.new(name)
+	obj = bpy.data.objects.new(name, data)
+	obj.location = location
+	bpy.context.scene.objects.link(obj)
+	bpy.context.scene.objects.active = obj
+	return obj
+
+def add_bones(obj, bones, roll = None):
+
+	edit_bones = obj.data.edit_bones
+	for b in bones:
+		bone = edit_bones.new(b['name'])
+		bone.head = b['head']
+		bone.tail = b['tail']
+		bone.use_deform = b.get('deform', True)
+
+	# Parents once every bone exists. Connecting a child moves its head to the parent's tail, as in edit mode.
+	for b in bones:
+		if b.get('parent'):
+			bone = edit_bones[b['name']]
+			bone.parent = edit_bones[b['parent']]
+			bone.use_connect = b.get('connect', False)
+
+	if roll is not None:
+		for bone in edit_bones:
+			bone.align_roll(roll)
+
+def add_constraints(obj, constraints):
+
+	for c in constraints:
+		constraint = obj.pose.bones[c['bone']].constraints.new(c['type'])
+		if 'subtarget' in c:
+			constraint.target = obj
+		if 'pole_subtarget' in c:
+			constraint.pole_target = obj
+		for attribute, value in c.items():
+			if attribute not in ['bone', 'type']:
+				setattr(constraint, attribute, value)
+
+def build_rig(spec, name = 'Armature', proportions = None, location = (0., 0., 0.)):
+
+	bones, constraints = expand_spec(spec, proportions)
+	obj = new_rig(name, location)
+
+	bpy.ops.object.mode_set(mode = 'EDIT')
+	add_bones(obj, bones, spec.get('roll'))
+	bpy.ops.object.mode_set(mode = 'POSE')
+	add_constraints(obj, constraints)
+	bpy.ops.object.mode_set(mode = 'OBJECT')
+
+	obj.data.use_mirror_x = 'mirror' in spec
+	obj.show_x_ray = True
+	print('Built {} with {} bones and {} constraints'.format(name, len(bones), len(constraints)))
+	return obj
+
+def build_variants(spec, variants, name = 'Armature', spacing = 15.):
+
+	# One rig per proportions dict (see RigSpec.proportion_variants), side by side on x.
+	rigs = []
+	for i, proportions in enumerate(variants):
+		rigs.append(build_rig(spec, '{}.{:03d}'.format(name, i), proportions, (i*spacing, 0., 0.)))
+	return rigs
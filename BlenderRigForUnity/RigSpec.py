@@ -0,0 +1,72 @@
+import json
+import random
+
+# Rig description as data, without bpy (see unity_rig.json, built by RigBuilder.py):
+#   bones:       name, head, tail, optional parent, connect (default false), deform (default true)
+#   constraints: bone, type, then any constraint attribute. subtarget/pole_subtarget name bones of the rig itself.
+#   mirror:      bones ending with 'from' are copied to the 'to' side, flipped on 'axis', constraints included.
+#                A constraint's 'mirror' entry overrides attributes of its mirrored copy.
+#   roll:        direction the bones' z axis is aligned to.
+#   chains:      bones scaled together around the head of an anchor bone, for proportion variants.
+
+
+def load_spec(path):
+	return json.load(open(path))
+
+def mirror_name(name, rule):
+
+	if name is not None and name.endswith(rule['from']):
+		return name[:-len(rule['from'])] + rule['to']
+	return name
+
+def mirror_point(point, axis):
+
+	point = list(point)
+	point[axis] = -point[axis]
+	return point
+
+def scaled_points(spec, proportions):
+
+	# {bone: (head, tail)} with the chains scaled, then the whole rig by proportions['scale'].
+	points = {b['name']:(list(b['head']), list(b['tail'])) for b in spec['bones']}
+	for chain, factor in proportions.items():
+		if chain == 'scale':
+			continue
+		anchor = list(points[spec['chains'][chain]['anchor']][0])
+		for name in spec['chains'][chain]['bones']:
+			points[name] = tuple([a + factor*(p - a) for p, a in zip(point, anchor)] for point in points[name])
+
+	scale = proportions.get('scale', 1.)
+	return {name:([scale*p for p in head], [scale*p for p in tail]) for name, (head, tail) in points.items()}
+
+def expand_spec(spec, proportions = None):
+
+	# (bones, constraints) of the whole rig: proportions applied, mirrored side added.
+	points = scaled_points(spec, proportions or {})
+	bones = []
+	for b in spec['bones']:
+		head, tail = points[b['name']]
+		bones.append(dict(b, head = head, tail = tail))
+	constraints = [dict((k, v) for k, v in c.items() if k != 'mirror') for c in spec.get('constraints', [])]
+
+	rule = spec.get('mirror')
+	if rule:
+		axis = rule.get('axis', 0)
+		for b in list(bones):
+			if b['name'].endswith(rule['from']):
+				bones.append(dict(b, name = mirror_name(b['name'], rule), parent = mirror_name(b.get('parent'), rule),
+					head = mirror_point(b['head'], axis), tail = mirror_point(b['tail'], axis)))
+
+		for c in spec.get('constraints', []):
+			if c['bone'].endswith(rule['from']):
+				mirrored = dict((k, mirror_name(v, rule) if k in ['bone', 'subtarget', 'pole_subtarget'] else v) for k, v in c.items() if k != 'mirror')
+				mirrored.update(c.get('mirror', {}))
+				constraints.append(mirrored)
+
+	return bones, constraints
+
+def proportion_variants(count, spread = .2, seed = 0, chains = ('scale', 'spine', 'arms', 'legs')):
+
+	# count random proportions, each factor within 1 +- spread.
+	rng = random.Random(seed)
+	return [dict((chain, 1. + rng.uniform(-spread, spread)) for chain in chains) for i in range(count)]
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from ClipFormat import read_clip, encode_toc, pad, data_offset, HEADER
+from CurveCore import map_library, channel_paths
+from CurveEval import clip_channels, clip_segments, sample_frames, SCENE_FPS
+
+# Bakes clips to dense float32 frames at a fixed rate (30, 60, 120 fps...), for Unity, which resamples the curves anyway.
+#
+#   magic | version | toc length | toc (json) | padding | frames block
+#
+# toc = {'name':..., 'meta':{...}, 'modes':{bone: rotation mode}, 'fps': F, 'scene_fps': S, 'start': first frame,
+#        'n_frames': N, 'channels': [[bone, channel], ...]}
+# The frames block is (N, channels) float32, one row per frame in channel order. Row i is scene frame start + i*S/F.
+# The last row is the first one at or past the clip's last key, holding its values.
+# Each channel is sampled on its own, so the four channels of a quaternion bone drift off unit length between keys:
+# they are renormalized on every frame.
+#
+# Every clip is baked in a worker process and written a chunk of frames at a time: memory is bounded by one clip's
+# segments and one chunk, whatever the size of the library.
+#
+#   python BakeLibrary.py Animations Baked --fps 60
+
+MAGIC = b'QBAKE'
+VERSION = 1
+FRAME_DTYPE = np.dtype('<f4')
+
+# Frames sampled and written at once.
+CHUNK_FRAMES = 1024
+
+def quaternion_columns(channels):
+
+	# (bones, 4) columns of the bones keyed on all four quaternion channels, in w, x, y, z order.
+	# Both namings: QW, QX... and RotW, RotX... of the dicts saved by FCurvesOperatorAll.py (see CurveCore.channel_paths).
+	columns = {}
+	for i, (bone, name) in enumerate(channels):
+		data_path, index = channel_paths.get(name, (None, None))
+		if data_path == 'rotation_quaternion':
+			columns.setdefault(bone, {})[index] = i
+	found = [[own[c] for c in range(4)] for own in columns.values() if len(own) == 4]
+	return np.array(found, dtype = np.int64).reshape(-1, 4)
+
+def normalize_quaternions(frames, columns):
+
+	# In place on (frames, channels) values. A zero quaternion becomes the identity.
+	q = frames[:, columns]
+	norm = np.linalg.norm(q, axis = 2, keepdims = True)
+	frames[:, columns] = np.where(norm > 1e-12, q/np.where(norm > 1e-12, norm, 1.), [1., 0., 0., 0.])
+
+def bake_clip(clip, path, fps = 60, scene_fps = SCENE_FPS, chunk = CHUNK_FRAMES):
+
+	channels = clip_channels(clip)
+	frames = np.zeros(0)
+	if clip.n_keys:
+		segments = clip_segments(clip)
+		start, end = segments.frame_range()
+		frames = sample_frames(start, end, fps, scene_fps, cover = True)
+
+	toc = {
+		'name':clip.name,
+		'meta':clip.meta,
+		'modes':clip.modes,
+		'fps':fps,
+		'scene_fps':scene_fps,
+		'start':float(frames[0]) if len(frames) else 0.,
+		'n_frames':len(frames),
+		'channels':[list(c) for c in channels],
+	}
+	encoded = encode_toc(toc)
+	columns = quaternion_columns(channels)
+
+	with open(path, 'wb') as f:
+		header = HEADER.pack(MAGIC, VERSION, len(encoded))
+		f.write(header)
+		f.write(encoded)
+		f.write(b'\0'*pad(len(header) + len(encoded)))
+		for i in range(0, len(frames), chunk):
+			values = segments.sample(frames[i:i + chunk]).T
+			normalize_quaternions(values, columns)
+			f.write(np.ascontiguousarray(values, dtype = FRAME_DTYPE).tobytes())
+
+	return toc
+
+def read_baked(path):
+
+	# (toc, (n_frames, channels) float32 frames) of a baked clip
+	with open(path, 'rb') as f:
+		magic, version, toc_length = HEADER.unpack(f.read(HEADER.size))
+		if magic != MAGIC:
+			raise ValueError('Not a baked clip')
+		if version != VERSION:
+			raise ValueError('Unsupported baked clip version {}'.format(version))
+		toc = json.loads(f.read(toc_length).decode('utf-8'))
+		f.seek(data_offset(toc_length))
+		count = toc['n_frames']*len(toc['channels'])
+		frames = np.frombuffer(f.read(count*FRAME_DTYPE.itemsize), dtype = FRAME_DTYPE)
+	return toc, frames.reshape(toc['n_frames'], len(toc['channels']))
+
+def bake_task(path, name, output, fps = 60, scene_fps = SCENE_FPS):
+
+	# Runs in a worker process (see CurveCore.map_library)
+	t0 = time.perf_counter()
+	clip = read_clip(path, name)
+	t1 = time.perf_counter()
+
+	destination = os.path.join(output, name + '.qbake')
+	os.makedirs(os.path.dirname(destination), exist_ok = True)
+	toc = bake_clip(clip, destination, fps, scene_fps)
+
+	return {
+		'source':path,
+		'target':destination,
+		'keys':clip.n_keys,
+		'frames':toc['n_frames'],
+		'channels':len(toc['channels']),
+		'size':os.path.getsize(destination),
+		'read':t1 - t0,
+		'bake':time.perf_counter() - t1,
+	}
+
+def bake_library(folder, output, fps = 60, scene_fps = SCENE_FPS, workers = None):
+	return map_library(bake_task, folder, (output, fps, scene_fps), workers)
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Bake every clip of a library to dense float32 frames at a fixed rate, for Unity')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('output', help = 'Folder receiving the baked clips (.qbake)')
+	parser.add_argument('--fps', type = float, default = 60., help = 'Rate of the baked frames, e.g. 30, 60 or 120')
+	parser.add_argument('--scene-fps', type = float, default = SCENE_FPS, help = 'Rate the clips were keyed at')
+	parser.add_argument('--workers', type = int, default = None)
+	args = parser.parse_args()
+
+	t0 = time.perf_counter()
+	results = bake_library(args.folder, args.output, args.fps, args.scene_fps, args.workers)
+	elapsed = time.perf_counter() - t0
+
+	failed = [r for r in results if 'error' in r]
+	for r in failed:
+		print('{:<50} FAILED {}'.format(r['source'], r['error']))
+	done = [r for r in results if 'error' not in r]
+	print('{} clips, {} keys -> {} frames, {} values, {} bytes at {:g} fps, {} failed in {:.2f} s'.format(len(results),
+		sum(r['keys'] for r in done), sum(r['frames'] for r in done), sum(r['frames']*r['channels'] for r in done),
+		sum(r['size'] for r in done), args.fps, len(failed), elapsed))
@@ -0,0 +1,387 @@
+import argparse
+import contextlib
+import fnmatch
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+
+import FakeBlender
+bpy = FakeBlender.install()
+
+import FCurvesOperatorAll
+import QuickTransfer
+import RigProfile
+from ClipFormat import read_clip
+from ClipPack import library_files, clip_name
+
+SAVER_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BlenderRigForUnity', 'F-curves Saver')
+sys.path.append(SAVER_FOLDER)
+import Loader
+import Saver
+from BasicHuma import Humanoid as SaverHumanoid
+
+# Headless benchmark of the save/load scripts over an animation library, with FakeBlender standing in for Blender.
+#
+#   python Benchmark.py Animations --output results.json [--baseline previous.json]
+#
+# Every tool saves and loads every clip of the library, through its own functions. Phases:
+#   decode    reading the file, up to the first key insertion
+#   keys      creating the keyframes (operators, or curves and key allocation for the bulk writer)
+#   handles   setting values and handles on the keyframes
+#   save      reading the f-curves back and writing the file
+# Timings are the scripts' own Python cost over the fake Blender, not Blender's: they are meant to compare versions of the scripts.
+# The fake builds its keyframes in Python, where Blender's foreach_set works in C: bulk loads look slower here than they are.
+# Loaded curves are checked against the clip. With the old tools, clips with two keys on one frame (subframe keys saved as ints)
+# show as MISMATCH: their rigs are seeded through key insertion, which merges them as Blender does.
+
+PHASES = ['decode', 'keys', 'handles', 'save']
+
+# Bones the old Humanoid classes look up by name. Heads are placed so that arm and leg lengths are 1 (no rescaling).
+HUMANOID_BONES = ['Pelvis', 'Spine1', 'Spine2', 'Head', 'Leg L', 'Leg R', 'Foot Control L', 'Foot Control R', 'Upperarm L',
+	'Upperarm R', 'IK Arm L', 'IK Arm R', 'IKT Arm L', 'IKT Arm R', 'IKT Leg L', 'IKT Leg R']
+HUMANOID_HEADS = {'Leg L':(0., 0., 1.), 'Upperarm L':(1., 0., 0.)}
+
+QUATERNION_PATHS = [('location', 0), ('location', 1), ('location', 2),
+	('rotation_quaternion', 0), ('rotation_quaternion', 1), ('rotation_quaternion', 2), ('rotation_quaternion', 3)]
+EULER_PATHS = [('location', 0), ('location', 1), ('location', 2), ('rotation_euler', 0), ('rotation_euler', 1), ('rotation_euler', 2)]
+
+
+class Phases():
+
+	# Times (and peak memory, when traced) of the phases of one run. The fake Blender events switch decode to keys to handles.
+	def __init__(self, memory = False):
+
+		self.memory = memory
+		self.current = None
+		self.begin = 0.
+		self.base = 0
+		self.results = OrderedDict()
+		FakeBlender.listeners.append(self.on_event)
+
+	def start(self, name):
+
+		self.stop()
+		self.current = name
+		if self.memory:
+			if hasattr(tracemalloc, 'reset_peak'):
+				tracemalloc.reset_peak()
+				self.base = tracemalloc.get_traced_memory()[0]
+			else:
+				tracemalloc.clear_traces()
+				self.base = 0
+		self.begin = time.perf_counter()
+
+	def stop(self):
+
+		if self.current is None:
+			return
+		elapsed = time.perf_counter() - self.begin
+		peak = tracemalloc.get_traced_memory()[1] - self.base if self.memory else None
+		self.results[self.current] = {'time':elapsed, 'peak_memory':peak}
+		self.current = None
+
+	def on_event(self, event):
+
+		if event == 'keyframe_insert' and self.current == 'decode':
+			self.start('keys')
+		elif event in ('fcurves', 'keyframe_write') and self.current == 'keys':
+			self.start('handles')
+
+	def close(self):
+
+		self.stop()
+		FakeBlender.listeners.remove(self.on_event)
+		return self.results
+
+
+def flat(frames, value):
+
+	frames = np.atleast_1d(np.asarray(frames, dtype = np.float64))
+	return np.column_stack((frames, np.full(len(frames), value), frames - 1, np.full(len(frames), value), frames + 1, np.full(len(frames), value)))
+
+def legacy_curves(clip):
+
+	# The old tools only know bones of 7 curves (location, quaternion), all of them in armature order. Euler bones get a flat
+	# W curve and their euler curves stand for X, Y, Z: the values mean nothing as a pose, but the keys are all there.
+	# The humanoid bones they look up are added with one flat key per curve.
+	curves = OrderedDict()
+	for bone in HUMANOID_BONES:
+		if bone not in clip.bones:
+			curves[bone] = [flat(0, 1. if i == 3 else 0.) for i in range(7)]
+
+	for bone, channels in clip.bones.items():
+		keys = [c.keys.astype(np.float64) for c in channels.values()]
+		if len(keys) == 6:
+			keys.insert(3, flat(keys[0][:, 0], 1.))
+		curves[bone] = keys
+
+	return curves
+
+def make_rig(bones, modes = None):
+
+	# The rigs of the previous run are gone: so are their profiles' pose bones.
+	FakeBlender.reset()
+	RigProfile.armature_profiles.clear()
+	return FakeBlender.make_armature(bones, modes, HUMANOID_HEADS)
+
+def seed_rig(curves, modes = None):
+
+	# Armature already holding the curves, keyed directly.
+	obj = make_rig(list(curves.keys()), modes)
+	for bone, keys in curves.items():
+		paths = QUATERNION_PATHS if len(keys) == 7 else EULER_PATHS
+		for (data_path, index), rows in zip(paths, keys):
+			FakeBlender.add_fcurve(obj, bone, data_path, index, rows)
+	return obj
+
+def rig_curves(obj):
+
+	# bone -> list of (n, 6) rows, read back from the action.
+	curves = OrderedDict()
+	for c in list.__iter__(obj.animation_data.action.fcurves):
+		rows = [list(k.co) + list(k.handle_left) + list(k.handle_right) for k in c.keyframe_points]
+		curves.setdefault(c.group.name, []).append(np.array(rows).reshape(-1, 6))
+	return curves
+
+def same_curves(expected, obj, tolerance = 1e-4):
+
+	found = rig_curves(obj)
+	for bone, keys in expected.items():
+		if bone not in found or len(found[bone]) != len(keys):
+			return False
+		for a, b in zip(keys, found[bone]):
+			if a.shape != b.shape or not np.allclose(a, b, atol = tolerance):
+				return False
+	return True
+
+def count_keys(curves):
+	return sum(len(k) for keys in curves.values() for k in keys)
+
+
+# Tools. Each one runs a save and a load through the tool's own functions and returns (keys, loaded curves are right).
+
+def run_quick_transfer(path, clip, folder, phases):
+
+	# Loads the library file itself (the old pickles through ClipFormat.load_pickle), then saves the loaded rig as a clip file.
+	expected = OrderedDict((b, [c.keys.astype(np.float64) for c in channels.values()]) for b, channels in clip.bones.items())
+	rig = QuickTransfer.Rig(make_rig(list(clip.bones.keys()), clip.modes))
+
+	phases.start('decode')
+	loaded = read_clip(path, clip.name)
+	QuickTransfer.load_dict(loaded, rig, 'Benchmark')
+	phases.stop()
+	ok = same_curves(expected, rig.rig)
+
+	phases.start('save')
+	QuickTransfer.save_dict(rig, os.path.join(folder, 'QuickTransfer'), clip.name)
+	phases.stop()
+	return count_keys(expected), ok
+
+def run_operator_dict(path, clip, folder, phases):
+
+	curves = legacy_curves(clip)
+	armature = FCurvesOperatorAll.Humanoid(seed_rig(curves))
+	output = os.path.join(folder, 'FCurvesOperatorAll.dict')
+
+	phases.start('save')
+	FCurvesOperatorAll.save_dict(armature.get_curves(), armature, output)
+	phases.stop()
+
+	armature = FCurvesOperatorAll.Humanoid(make_rig(list(curves.keys())))
+	phases.start('decode')
+	FCurvesOperatorAll.load_dict(output, armature, 'Benchmark')
+	phases.stop()
+	return count_keys(curves), same_curves(curves, armature.armature)
+
+def run_operator_all(path, clip, folder, phases):
+
+	curves = legacy_curves(clip)
+	armature = FCurvesOperatorAll.Humanoid(seed_rig(curves))
+	output = os.path.join(folder, 'FCurvesOperatorAll.all')
+
+	phases.start('save')
+	FCurvesOperatorAll.save_all(armature.get_curves(), armature, output)
+	phases.stop()
+
+	armature = FCurvesOperatorAll.Humanoid(make_rig(list(curves.keys())))
+	phases.start('decode')
+	FCurvesOperatorAll.load_all(output, armature, 'Benchmark')
+	phases.stop()
+	return count_keys(curves), same_curves(curves, armature.armature)
+
+def run_saver(path, clip, folder, phases):
+
+	curves = legacy_curves(clip)
+	armature = SaverHumanoid(seed_rig(curves))
+	output = os.path.join(folder, 'FCurvesSaver')
+
+	phases.start('save')
+	Saver.StructureSaver(clip.name, armature.get_curves(), armature).save(output)
+	phases.stop()
+
+	armature = SaverHumanoid(make_rig(list(curves.keys())))
+	phases.start('decode')
+	Loader.Load(output, armature, 'Benchmark')
+	phases.stop()
+	return count_keys(curves), same_curves(curves, armature.armature)
+
+TOOLS = OrderedDict([
+	('QuickTransfer', run_quick_transfer),
+	('FCurvesOperatorAll.dict', run_operator_dict),
+	('FCurvesOperatorAll.all', run_operator_all),
+	('FCurvesSaver', run_saver),
+])
+
+
+def run_once(tool, path, clip, folder, memory):
+
+	gc.collect()
+	phases = Phases(memory)
+	try:
+		with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+			keys, ok = TOOLS[tool](path, clip, folder, phases)
+	finally:
+		results = phases.close()
+	return keys, ok, results
+
+def benchmark(path, clip, tool, folder, repeat = 1, memory = True):
+
+	# Best time of the repeats for each phase, peak memory from one more traced run.
+	# A tool failing on a clip is reported, the benchmark goes on.
+	try:
+		return measure(path, clip, tool, folder, repeat, memory)
+	except Exception as e:
+		return {'keys':0, 'ok':False, 'error':'{}: {}'.format(type(e).__name__, e), 'phases':OrderedDict()}
+
+def measure(path, clip, tool, folder, repeat, memory):
+
+	phases = OrderedDict()
+	for _ in range(repeat):
+		keys, ok, results = run_once(tool, path, clip, folder, False)
+		for name, r in results.items():
+			if name not in phases or r['time'] < phases[name]['time']:
+				phases[name] = {'time':r['time']}
+
+	if memory:
+		tracemalloc.start()
+		try:
+			_, _, results = run_once(tool, path, clip, folder, True)
+		finally:
+			tracemalloc.stop()
+		for name, r in results.items():
+			phases[name]['peak_memory'] = r['peak_memory']
+
+	for name, p in phases.items():
+		p['keys_per_second'] = keys/p['time'] if p['time'] > 0 else None
+
+	ordered = OrderedDict((name, phases[name]) for name in PHASES if name in phases)
+	return {'keys':keys, 'ok':ok, 'phases':ordered}
+
+def totals(files):
+
+	# Per tool and phase: summed time and keys, worst peak memory.
+	result = OrderedDict()
+	for tools in files.values():
+		for tool, r in tools.items():
+			total = result.setdefault(tool, OrderedDict())
+			for name, p in r['phases'].items():
+				t = total.setdefault(name, {'time':0., 'keys':0, 'peak_memory':None})
+				t['time'] += p['time']
+				t['keys'] += r['keys']
+				if p.get('peak_memory') is not None:
+					t['peak_memory'] = max(t['peak_memory'] or 0, p['peak_memory'])
+
+	for total in result.values():
+		for t in total.values():
+			t['keys_per_second'] = t['keys']/t['time'] if t['time'] > 0 else None
+	return result
+
+def compare(results, baseline, threshold):
+
+	# Prints the time ratio to a previous run for every tool and phase. Returns the phases slower than the threshold.
+	slower = []
+	for tool, total in results['totals'].items():
+		for name, t in total.items():
+			old = baseline.get('totals', {}).get(tool, {}).get(name)
+			if old is None or not old['time']:
+				continue
+			ratio = t['time']/old['time']
+			flag = ''
+			if ratio > 1 + threshold:
+				flag = '<- slower'
+				slower.append((tool, name, ratio))
+			print('{:<26} {:<8} x{:.2f} {}'.format(tool, name, ratio, flag))
+	return slower
+
+def format_phases(phases):
+	return '  '.join('{} {:>8.1f} ms'.format(name, p['time']*1000) for name, p in phases.items())
+
+def format_memory(value):
+	return '-' if value is None else '{:.1f} MB'.format(value/2.**20)
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Benchmark the animation save/load scripts without Blender')
+	parser.add_argument('folder', nargs = '?', default = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Animations'),
+		help = 'Library folder (default: Animations)')
+	parser.add_argument('--output', default = 'benchmark.json', help = 'Results file (json)')
+	parser.add_argument('--baseline', help = 'Results of a previous run to compare with')
+	parser.add_argument('--threshold', type = float, default = 0.1, help = 'Relative slow down reported as a regression')
+	parser.add_argument('--tools', nargs = '+', choices = list(TOOLS.keys()), default = list(TOOLS.keys()))
+	parser.add_argument('--files', default = '*', help = 'Pattern on clip names, e.g. "Runs/San*"')
+	parser.add_argument('--repeat', type = int, default = 3, help = 'Runs per clip and tool, the best time is kept')
+	parser.add_argument('--no-memory', action = 'store_true', help = 'Skip the traced run measuring peak memory')
+	args = parser.parse_args()
+
+	folder = tempfile.mkdtemp()
+	files = OrderedDict()
+	try:
+		for path in library_files(args.folder):
+			name = clip_name(args.folder, path)
+			if not fnmatch.fnmatch(name, args.files):
+				continue
+
+			clip = read_clip(path, name)
+			files[name] = OrderedDict()
+			for tool in args.tools:
+				r = benchmark(path, clip, tool, folder, args.repeat, not args.no_memory)
+				files[name][tool] = r
+				status = r['error'] if 'error' in r else 'ok' if r['ok'] else 'MISMATCH'
+				print('{:<36} {:<24} {:>6} keys  {}  {}'.format(name, tool, r['keys'], format_phases(r['phases']), status))
+	finally:
+		shutil.rmtree(folder)
+
+	results = OrderedDict([
+		('python', platform.python_version()),
+		('platform', platform.platform()),
+		('folder', args.folder),
+		('files', files),
+	])
+	results['totals'] = totals(files)
+
+	print('')
+	for tool, total in results['totals'].items():
+		for name, t in total.items():
+			print('{:<26} {:<8} {:>9.1f} ms {:>12.0f} keys/s  peak {}'.format(tool, name, t['time']*1000, t['keys_per_second'] or 0,
+				format_memory(t['peak_memory'])))
+
+	with open(args.output, 'w') as f:
+		json.dump(results, f, indent = 1)
+	print('Results written to {}'.format(args.output))
+
+	if args.baseline:
+		print('')
+		with open(args.baseline) as f:
+			slower = compare(results, json.load(f), args.threshold)
+		if slower:
+			sys.exit(1)
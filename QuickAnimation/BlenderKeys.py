@@ -0,0 +1,75 @@
+import bpy
+import numpy as np
+
+from CurveCore import rest_values, rotation_path
+
+# Bulk keyframe writer: an action is written through its f-curves, not through keyframe_insert_menu.
+# Each curve is created once, all its keys are allocated in one call, then co and handles are filled from flat
+# float32 buffers (foreach_set). No selection, no frame change, so no scene update per frame.
+#
+# curves: (bone, data path, index, rows) with rows of (frame, value, left x, left y, right x, right y), see CurveCore.py.
+#
+# reset_pose and key_bones replace select_all + loc_clear/rot_clear and select + keyframe_insert_menu: bones are reached
+# by name, the selection and the active bone are never touched.
+
+
+def bone_path(bone, data_path):
+	return 'pose.bones["{}"].{}'.format(bone, data_path)
+
+def key_buffers(rows):
+
+	# Flat co, handle_left and handle_right buffers, as foreach_set wants them.
+	rows = np.asarray(rows, dtype = np.float32).reshape(-1, 6)
+	return [np.ascontiguousarray(rows[:, i:i + 2]).ravel() for i in [0, 2, 4]]
+
+def new_action(obj, name):
+
+	obj.animation_data_create()
+	obj.animation_data.action = bpy.data.actions.new(name = name)
+	return obj.animation_data.action
+
+def write_curves(obj, curves, name):
+
+	# Replaces the object's action by a new one holding the curves.
+	action = new_action(obj, name)
+	add_curves(action, curves)
+	return action
+
+def add_curves(action, curves):
+
+	# Adds the curves to an existing action, replacing the ones animating the same channels. Keys must come in frame order.
+	paths = set((bone_path(bone, data_path), index) for bone, data_path, index, rows in curves)
+	for c in [c for c in action.fcurves if (c.data_path, c.array_index) in paths]:
+		action.fcurves.remove(c)
+
+	# Allocation first, then values: keys of a curve are only touched through the buffers.
+	created = []
+	for bone, data_path, index, rows in curves:
+		c = action.fcurves.new(bone_path(bone, data_path), index = index, action_group = bone)
+		c.keyframe_points.add(len(rows))
+		created.append((c, rows))
+
+	# No c.update(): keys are already sorted and it would recompute the auto handles over the saved ones.
+	for c, rows in created:
+		co, left, right = key_buffers(rows)
+		c.keyframe_points.foreach_set('co', co)
+		c.keyframe_points.foreach_set('handle_left', left)
+		c.keyframe_points.foreach_set('handle_right', right)
+
+	return action
+
+def reset_pose(obj, bones = None):
+
+	# Location and rotation back to rest (all bones by default), as loc_clear and rot_clear do on a selection.
+	for pose_bone in obj.pose.bones:
+		if bones is None or pose_bone.name in bones:
+			for data_path in ['location', 'rotation_quaternion', 'rotation_euler', 'rotation_axis_angle']:
+				getattr(pose_bone, data_path)[:] = rest_values[data_path]
+
+def key_bones(obj, bones, frame):
+
+	# Keys the current location and rotation of the bones at frame, in their bone's group.
+	for name in bones:
+		pose_bone = obj.pose.bones[name]
+		for data_path in ['location', rotation_path(pose_bone.rotation_mode)]:
+			pose_bone.keyframe_insert(data_path, frame = frame, group = name)
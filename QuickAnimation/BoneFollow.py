@@ -1,41 +1,202 @@
 import bpy 
 import math 
 import mathutils as m 
+import re
 
+import numpy as np
 
+import PoseMath
+from BlenderKeys import add_curves, key_bones
+from CurveCore import baked_rows, read_keys, rotation_path
+from CurveEval import evaluate_batch
 
-def select_bone_from_name(rig, name): 
+# Two ways of following: the analytic one evaluates the curves and the bone hierarchy with PoseMath.py and writes the
+# follower's keys in bulk, without changing frame. Bones with constraints (or not inheriting their parent's transform)
+# need Blender's own evaluation: the scene is then set to each key frame, as before.
+
+CHANNEL_PATH = re.compile(r'pose\.bones\["(.+)"\]\.(\w+)$')
 
-	bpy.ops.pose.select_all(action ='DESELECT')
-	rig.data.bones.active = rig.data.bones[name]
-	rig.data.bones[name].select = True
 
 def set_frame(nb): 
 	bpy.context.scene.frame_set(nb)
 	print('Current frame is: {}'.format(bpy.context.scene.frame_current))
 
 def add_kf_to_bone(rig, name): 
+	key_bones(rig, [name], bpy.context.scene.frame_current)
+
+
+def bone_rest(rig): 
+	return {b.name:(b.parent.name if b.parent else None, np.array(b.matrix_local, dtype = np.float64)) for b in rig.data.bones}
+
+def scene_bones(rig, bones): 
+
+	# Bones whose pose is not given by their curves and their parent alone.
+	found = []
+	for name in bones: 
+		bone = rig.data.bones[name]
+		if len(rig.pose.bones[name].constraints) or not (bone.use_inherit_rotation and bone.use_local_location and getattr(bone, 'use_inherit_scale', True)): 
+			found.append(name)
+	return found
+
+def action_channels(action, bones): 
+
+	# {bone: {(data path, index): rows}} of the curves animating the given bones.
+	channels = {}
+	for c in action.fcurves: 
+		match = CHANNEL_PATH.match(c.data_path)
+		if match and match.group(1) in bones: 
+			channels.setdefault(match.group(1), {})[(match.group(2), c.array_index)] = read_keys(c)
+	return channels
+
+def sample_channels(channel_sets): 
+
+	# channel_sets: [(channels, frames)] as given by action_channels. Every curve of every set is evaluated in one batch,
+	# returns {bone: {(data path, index): values}} for each set.
+	names = []
+	curves = []
+	for i, (channels, frames) in enumerate(channel_sets): 
+		for bone, own in channels.items(): 
+			for key, rows in own.items(): 
+				names.append((i, bone, key))
+				curves.append((rows, frames))
+
+	samples = [{} for channel_set in channel_sets]
+	for (i, bone, key), values in zip(names, evaluate_batch(curves)): 
+		samples[i].setdefault(bone, {})[key] = values
+	return samples
+
+def channel_values(pose_bone, samples, data_path, frames): 
+
+	# (n, size) values of a property, its current value where no curve animates it.
+	columns = []
+	for index, value in enumerate(getattr(pose_bone, data_path)): 
+		columns.append(samples.get((data_path, index), np.full(len(frames), value)))
+	return np.column_stack(columns)
+
+def bone_bases(rig, samples, bones, frames): 
+
+	bases = {}
+	for name in bones: 
+		pose_bone = rig.pose.bones[name]
+		own = samples.get(name, {})
+		bases[name] = PoseMath.basis_matrices(channel_values(pose_bone, own, 'location', frames), 
+			channel_values(pose_bone, own, rotation_path(pose_bone.rotation_mode), frames), 
+			pose_bone.rotation_mode, channel_values(pose_bone, own, 'scale', frames))
+	return bases
+
+def key_frames(channels, bones): 
+
+	frames = [rows[:, 0] for b in bones for rows in channels.get(b, {}).values()]
+	return np.unique(np.concatenate(frames)) if frames else np.zeros(0)
+
+def follow_actions(rig, actions, target_name, bone_name, offset = None, rest = None): 
+
+	# {action: follower curves (bone, data path, index, rows)}, keyed on every key frame of the target and its parents.
+	# offset: optional 4x4 transform of the follower in the target's space (see PoseMath.offset_matrix).
+	# Curves of all actions are evaluated together, then all their frames go through the hierarchy as one array.
+	rest = rest or bone_rest(rig)
+	target_chain = PoseMath.chain(rest, target_name)
+	parent_chain = PoseMath.chain(rest, bone_name)[:-1]
+	bones = set(target_chain + parent_chain)
+
+	baked = []
+	channel_sets = []
+	for action in actions: 
+		channels = action_channels(action, bones)
+		frames = key_frames(channels, target_chain)
+		if len(frames): 
+			baked.append((action, frames))
+			channel_sets.append((channels, frames))
+	if not baked: 
+		return {}
+
+	# One evaluation of all curves, one pass through the hierarchy for the frames of all actions.
+	all_bases = [bone_bases(rig, samples, bones, frames) for samples, (channels, frames) in zip(sample_channels(channel_sets), channel_sets)]
+	bases = {b:np.concatenate([action_bases[b] for action_bases in all_bases]) for b in bones}
+	n = sum(len(frames) for action, frames in baked)
+	target = PoseMath.pose_matrices(rest, target_name, bases, n)
+	if offset is not None: 
+		target = np.matmul(target, offset)
+	parent = rest[bone_name][0]
+	parent_matrices = PoseMath.pose_matrices(rest, parent, bases, n) if parent else None
+	location, rotation, scale = PoseMath.decompose(PoseMath.pose_to_basis(rest, bone_name, target, parent_matrices))
+
+	mode = rig.pose.bones[bone_name].rotation_mode
+	values = [('location', location), (rotation_path(mode), PoseMath.matrix_rotations(rotation, mode))]
+
+	curves = {}
+	start = 0
+	for action, frames in baked: 
+		end = start + len(frames)
+		curves[action] = [(bone_name, data_path, index, baked_rows(frames, v[start:end, index])) for data_path, v in values for index in range(v.shape[1])]
+		start = end
+	return curves
+
+def follow_curves(rig, action, target_name, bone_name, offset = None, rest = None): 
+	return follow_actions(rig, [action], target_name, bone_name, offset, rest).get(action, [])
+
+def blocking_bones(rig, rest, target_name, bone_name): 
+
+	# Bones preventing the analytic follow, see scene_bones. The follower can not be one of the target's parents either.
+	blocked = scene_bones(rig, PoseMath.chain(rest, target_name) + PoseMath.chain(rest, bone_name))
+	if bone_name in PoseMath.chain(rest, target_name): 
+		blocked.append(bone_name)
+	return blocked
+
+def follow_in_animation(rig, target_name, bone_name, analytic = True, offset = None): 
+
+	rig.pose.bones[bone_name].rotation_mode  = rig.pose.bones[target_name].rotation_mode
 
-	select_bone_from_name(rig, name)
-	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
+	if analytic: 
+		rest = bone_rest(rig)
+		blocked = blocking_bones(rig, rest, target_name, bone_name)
+		if not blocked: 
+			curves = follow_curves(rig, rig.animation_data.action, target_name, bone_name, offset, rest)
+			add_curves(rig.animation_data.action, curves)
+			print('{} keys baked on {}'.format(sum(len(c[3]) for c in curves), bone_name))
+			return 
 
+		print('Following frame by frame, bones need the scene: {}'.format(blocked))
 
-def follow_in_animation(rig, target_name, bone_name): 
+	follow_in_scene(rig, target_name, bone_name, offset)
 
-	rig = bpy.data.objects['Armature']
+def follow_all_actions(rig, target_name, bone_name, analytic = True, offset = None, actions = None): 
+
+	# Every action (all of bpy.data by default) at once. Actions not animating the target are left alone.
+	actions = list(bpy.data.actions) if actions is None else actions
 	rig.pose.bones[bone_name].rotation_mode  = rig.pose.bones[target_name].rotation_mode
 
+	if analytic: 
+		rest = bone_rest(rig)
+		blocked = blocking_bones(rig, rest, target_name, bone_name)
+		if not blocked: 
+			baked = follow_actions(rig, actions, target_name, bone_name, offset, rest)
+			for action, curves in baked.items(): 
+				add_curves(action, curves)
+			print('{} actions baked on {}'.format(len(baked), bone_name))
+			return 
+
+		print('Following frame by frame, bones need the scene: {}'.format(blocked))
+
+	for action in actions: 
+		rig.animation_data.action = action
+		follow_in_scene(rig, target_name, bone_name, offset)
+
+def follow_in_scene(rig, target_name, bone_name, offset = None): 
+
 	current_animation = rig.animation_data.action
 	curves = current_animation.fcurves
+	all_bones = [b.name for b in rig.pose.bones]
 	set_frame(0)
-	bpy.ops.pose.select_all(action='SELECT')
-	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
-	set_frame(int(current_animation.fcurves[0].keyframe_points[-1].co.x))
-	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
+	key_bones(rig, all_bones, 0)
+	last = int(current_animation.fcurves[0].keyframe_points[-1].co.x)
+	set_frame(last)
+	key_bones(rig, all_bones, last)
 
 
 	target_bone = rig.pose.bones[target_name]
 	source_bone = rig.pose.bones[bone_name]
+	offset = m.Matrix(offset.tolist()) if offset is not None else m.Matrix.Identity(4)
 
 
 	for curve in curves:
@@ -46,9 +207,8 @@ def follow_in_animation(rig, target_name, bone_name):
 
 				set_frame(int(kf.co.x))
 
-				source_bone.matrix = target_bone.matrix
-				select_bone_from_name(rig, bone_name)
-				bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
+				source_bone.matrix = target_bone.matrix * offset
+				key_bones(rig, [bone_name], int(kf.co.x))
 			break 
 
 class DialogOperator(bpy.types.Operator):
@@ -59,6 +219,9 @@ class DialogOperator(bpy.types.Operator):
 	bone_name = bpy.props.StringProperty(name="Following bone")
 	bone_target_name = bpy.props.StringProperty(name="Bone to follow")
 	all_anims = bpy.props.BoolProperty(name="All animations ?")
+	analytic = bpy.props.BoolProperty(name="Bake without stepping frames", default = True)
+	offset_location = bpy.props.FloatVectorProperty(name="Location offset (target space)", size = 3)
+	offset_rotation = bpy.props.FloatVectorProperty(name="Rotation offset", size = 3, subtype = 'EULER')
 	# path_to_anim += "/home/mehdi/Blender/Scripts/"
 
 	def execute(self, context):
@@ -77,24 +240,29 @@ class DialogOperator(bpy.types.Operator):
 		wm = context.window_manager
 		return wm.invoke_props_dialog(self)
 
+	def offset(self): 
+		if not any(self.offset_location) and not any(self.offset_rotation): 
+			return None
+		return PoseMath.offset_matrix(self.offset_location, self.offset_rotation)
+
 	def launch_follow_all(self): 
 
-		all_actions = bpy.data.actions
 		rig = bpy.data.objects[self.armature_name]
-		for action in all_actions: 
-
-			rig.animation_data.action = action
-			follow_in_animation(rig, self.bone_target_name, self.bone_name)
+		follow_all_actions(rig, self.bone_target_name, self.bone_name, self.analytic, self.offset())
 
 
 	def launch_follow(self): 
 
 		rig = bpy.data.objects[self.armature_name]
-		follow_in_animation(rig,self.bone_target_name, self.bone_name)
+		follow_in_animation(rig,self.bone_target_name, self.bone_name, self.analytic, self.offset())
+
 
+def register(): 
+	bpy.utils.register_class(DialogOperator)
 
-bpy.utils.register_class(DialogOperator)
 
-# test call
-bpy.ops.object.dialog_operator('INVOKE_DEFAULT', armature_name = 'Armature')
+if __name__ == '__main__': 
+	register()
 
+	# test call
+	bpy.ops.object.dialog_operator('INVOKE_DEFAULT', armature_name = 'Armature')
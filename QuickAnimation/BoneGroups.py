@@ -0,0 +1,41 @@
+from fnmatch import fnmatchcase
+
+# Named groups of bones for partial loads, as fnmatch patterns over Rigify names.
+# A bone mask is a list (or a comma separated string) of group names, bone names or patterns.
+
+BONE_GROUPS = {
+	'spine.lower': ['root', 'torso', 'hips', 'tweak_spine', 'tweak_spine.001', 'tweak_spine.002'],
+	'spine.upper': ['chest', 'neck', 'head', 'tweak_spine.003', 'tweak_spine.004', 'tweak_spine.005'],
+	'arm.L': ['shoulder.L', 'upper_arm*.L*', 'forearm*.L*', 'hand_*.L*'],
+	'arm.R': ['shoulder.R', 'upper_arm*.R*', 'forearm*.R*', 'hand_*.R*'],
+	'fingers.L': ['palm.L', 'f_*.L', 'thumb.*.L', 'tweak_f_*.L*', 'tweak_thumb.*.L*'],
+	'fingers.R': ['palm.R', 'f_*.R', 'thumb.*.R', 'tweak_f_*.R*', 'tweak_thumb.*.R*'],
+	'leg.L': ['thigh*.L*', 'shin*.L*', 'foot*.L*', 'toe.L'],
+	'leg.R': ['thigh*.R*', 'shin*.R*', 'foot*.R*', 'toe.R'],
+}
+
+BONE_GROUPS['arms'] = BONE_GROUPS['arm.L'] + BONE_GROUPS['arm.R']
+BONE_GROUPS['legs'] = BONE_GROUPS['leg.L'] + BONE_GROUPS['leg.R']
+BONE_GROUPS['upper_body'] = BONE_GROUPS['spine.upper'] + BONE_GROUPS['arms'] + BONE_GROUPS['fingers.L'] + BONE_GROUPS['fingers.R']
+BONE_GROUPS['lower_body'] = BONE_GROUPS['spine.lower'] + BONE_GROUPS['legs']
+
+
+def mask_patterns(mask):
+
+	if isinstance(mask, str):
+		mask = [m.strip() for m in mask.split(',') if m.strip()]
+
+	patterns = []
+	for m in mask:
+		patterns.extend(BONE_GROUPS.get(m, [m]))
+
+	return patterns
+
+def resolve_bones(bones, mask):
+
+	# Keeps the order of bones. An empty or None mask keeps everything.
+	if not mask:
+		return list(bones)
+
+	patterns = mask_patterns(mask)
+	return [b for b in bones if any(fnmatchcase(b, p) for p in patterns)]
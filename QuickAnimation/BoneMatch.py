@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+
+# Bone correspondence between two rigs from their rest data alone (RigProfile data), whatever their bone names.
+# Each rig is brought to a unit height, standing on its lowest point and centered on its main bone, then every pair
+# of bones is scored on:
+#   place:     distance between heads and between tails, and being on opposite sides
+#   direction: angle between the bones' y axes
+#   length:    length ratio
+#   hierarchy: depth in the hierarchy (as a fraction of the rig's depth) and number of children
+# Pairs are taken greedily, cheapest first, each bone at most once. A second pass adds a cost to the pairs whose
+# parents were not matched together, so the chains follow each other.
+#
+# A solved pair of rigs is kept by (source hash, target hash), for the session and in bone_matches.json next to the .blend.
+
+MATCH_FILE = 'bone_matches.json'
+
+WEIGHTS = {'place':4., 'direction':1., 'length':.5, 'depth':1., 'children':.1, 'side':1., 'parent':.5}
+
+# Pairs costing more than this are left unmatched.
+MAX_COST = 1.5
+
+# Solved tables of the session, by (source hash, target hash).
+matches = {}
+
+
+def skeleton(profile):
+
+	# Per bone arrays of a profile's data, in unit height coordinates.
+	rest = np.array(profile['rest'], dtype = np.float64)
+	lengths = np.array(profile['bone_lengths'], dtype = np.float64)
+	heads = rest[:, :3, 3]
+	directions = rest[:, :3, 1]/np.maximum(np.linalg.norm(rest[:, :3, 1], axis = 1), 1e-9)[:, None]
+	tails = heads + directions*lengths[:, None]
+
+	parents = np.array(profile['parents'], dtype = np.int64)
+	depth = np.zeros(len(parents))
+	descendants = np.zeros(len(parents))
+	for i in range(len(parents)):
+		p = parents[i]
+		while p >= 0:
+			depth[i] += 1.
+			descendants[p] += 1.
+			p = parents[p]
+
+	# Centered on the head of the bone holding most of the hierarchy (hips, root...): bones missing on one side
+	# do not move the center, so left and right stay apart.
+	points = np.vstack((heads, tails))
+	size = max(points[:, 2].max() - points[:, 2].min(), 1e-6)
+	center = heads[np.argmax(descendants)]
+	origin = np.array([center[0], center[1], points[:, 2].min()])
+
+	return {
+		'bones':profile['bones'],
+		'heads':(heads - origin)/size,
+		'tails':(tails - origin)/size,
+		'directions':directions,
+		'lengths':lengths/size,
+		'depth':depth/max(depth.max(), 1.),
+		'children':np.bincount(parents[parents >= 0], minlength = len(parents)).astype(np.float64),
+		'parents':parents,
+	}
+
+def pair_costs(source, target, weights = WEIGHTS):
+
+	# (source bones, target bones) matrix of the costs without the parent term
+	place = np.linalg.norm(source['heads'][:, None] - target['heads'][None], axis = 2)
+	place += np.linalg.norm(source['tails'][:, None] - target['tails'][None], axis = 2)
+	direction = 1. - np.clip(source['directions'].dot(target['directions'].T), -1., 1.)
+	length = np.abs(np.log((source['lengths'][:, None] + 1e-3)/(target['lengths'][None] + 1e-3)))
+	depth = np.abs(source['depth'][:, None] - target['depth'][None])
+	children = np.minimum(np.abs(source['children'][:, None] - target['children'][None]), 3.)
+	side = np.sign(np.round(source['heads'][:, 0], 2))[:, None]*np.sign(np.round(target['heads'][:, 0], 2))[None] < 0.
+
+	return (weights['place']*place/2. + weights['direction']*direction + weights['length']*length
+		+ weights['depth']*depth + weights['children']*children + weights['side']*side)
+
+def greedy_pairs(costs, rows, max_cost = MAX_COST):
+
+	# Index of the target bone of each source bone (-1 for none), cheapest pairs first. Only the rows' bones are matched.
+	match = np.full(costs.shape[0], -1, dtype = np.int64)
+	taken = np.zeros(costs.shape[1], dtype = bool)
+	candidates = costs[rows]
+	order = np.argsort(candidates, axis = None)
+	for flat in order[:np.searchsorted(candidates.ravel()[order], max_cost, side = 'right')]:
+		r, t = divmod(int(flat), costs.shape[1])
+		if match[rows[r]] < 0 and not taken[t]:
+			match[rows[r]] = t
+			taken[t] = True
+	return match
+
+def solve(source_profile, target_profile, bones = None, weights = WEIGHTS, max_cost = MAX_COST):
+
+	# {source bone: target bone}. bones: source bones to match (e.g. the ones a clip keys), all by default.
+	source = skeleton(source_profile)
+	target = skeleton(target_profile)
+	rows = np.array([i for i, b in enumerate(source['bones']) if bones is None or b in bones], dtype = np.int64)
+	costs = pair_costs(source, target, weights)
+	match = greedy_pairs(costs, rows, max_cost)
+
+	# Parents matched elsewhere cost extra, then pairs are taken again
+	parents = source['parents']
+	parent_match = np.where(parents >= 0, match[parents], -2)
+	disagree = (parent_match[:, None] >= 0) & (parent_match[:, None] != target['parents'][None])
+	match = greedy_pairs(costs + weights['parent']*disagree, rows, max_cost)
+
+	return {source['bones'][s]:target['bones'][t] for s, t in enumerate(match) if t >= 0}
+
+def load_matches(path):
+
+	if path is None or not os.path.isfile(path):
+		return {}
+	return json.load(open(path))
+
+def match_rigs(source_profile, target_profile, path = None):
+
+	# Table of a pair of rigs: from the session, else from the match file at path, else solved (and saved there).
+	key = (source_profile['hash'], target_profile['hash'])
+	if key not in matches:
+		saved = load_matches(path)
+		name = '{} {}'.format(*key)
+		if name in saved:
+			matches[key] = saved[name]
+		else:
+			matches[key] = solve(source_profile, target_profile)
+			print('Matched {} of {} bones'.format(len(matches[key]), len(source_profile['bones'])))
+			if path is not None:
+				saved[name] = matches[key]
+				with open(path, 'w') as f:
+					json.dump(saved, f, separators = (',', ':'))
+	return matches[key]
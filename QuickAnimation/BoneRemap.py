@@ -0,0 +1,123 @@
+import json
+import re
+
+from collections import OrderedDict
+
+import numpy as np
+
+from ClipFormat import KEY_FIELDS
+from CurveCore import channel_paths, rest_curves
+
+# Bone name remapping for loading a clip on a rig whose bones are named differently.
+# A table has explicit renames and regex rules, tried in this order: the first rule matching a name renames it
+# (re.sub with the rule's replacement). A name without explicit entry or matching rule is kept as it is.
+#
+# A table is compiled once per (clip bones, rig bones) into one integer per rig bone: the index of its source bone
+# in the clip, -1 when the clip has none. Loading then reads the mapping instead of testing names, and gathers
+# the keys of every mapped channel at once.
+
+REMAP_TABLES = {
+	# Rigify controls onto the rig of ArmatureUnity.py. Values are copied as they are, bone axes are not converted.
+	'rigify_to_unity': {
+		'explicit': {'torso':'Pelvis', 'chest':'Spine2', 'head':'Head'},
+		'rules': [
+			[r'^hand_ik\.([LR])$', r'IK Arm \1'],
+			[r'^foot_ik\.([LR])$', r'Foot Control \1'],
+			[r'^shoulder\.([LR])$', r'Shoulder \1'],
+			[r'^upper_arm_fk\.([LR])$', r'Upperarm \1'],
+			[r'^forearm_fk\.([LR])$', r'Arm \1'],
+			[r'^hand_fk\.([LR])$', r'Hand \1'],
+			[r'^thigh_fk\.([LR])$', r'Leg \1'],
+			[r'^shin_fk\.([LR])$', r'Knee \1'],
+			[r'^foot_fk\.([LR])$', r'Foot \1'],
+		],
+	},
+}
+
+# Compiled tables by name, and compiled mappings by (table, clip bones, rig bones).
+compiled_tables = {}
+compiled_mappings = {}
+
+
+def add_table(name, explicit = None, rules = ()):
+
+	# Adds or replaces a table, forgetting what was compiled from the previous one. Returns its name.
+	REMAP_TABLES[name] = {'explicit':explicit or {}, 'rules':[list(r) for r in rules]}
+	compiled_tables.pop(name, None)
+	for key in [k for k in compiled_mappings if k[0] == name]:
+		del compiled_mappings[key]
+	return name
+
+def load_tables(path):
+
+	# Adds the tables of a json file ({name: {'explicit': {...}, 'rules': [[pattern, replacement], ...]}}).
+	tables = json.load(open(path), object_pairs_hook = OrderedDict)
+	for name, table in tables.items():
+		add_table(name, table.get('explicit'), table.get('rules', []))
+	return list(tables.keys())
+
+def compile_table(name):
+
+	if name not in compiled_tables:
+		if name not in REMAP_TABLES:
+			raise KeyError('No remap table {}'.format(name))
+		table = REMAP_TABLES[name]
+		rules = [(re.compile(pattern), replacement) for pattern, replacement in table.get('rules', [])]
+		compiled_tables[name] = (table.get('explicit', {}), rules)
+	return compiled_tables[name]
+
+def remap_name(name, table):
+
+	explicit, rules = compile_table(table)
+	if name in explicit:
+		return explicit[name]
+	for pattern, replacement in rules:
+		if pattern.search(name):
+			return pattern.sub(replacement, name)
+	return name
+
+def compile_mapping(table, source_bones, target_bones):
+
+	# Index in source_bones of the bone feeding each target bone, -1 for none. The first source bone renamed
+	# to a target bone takes it. table None keeps the names.
+	key = (table, tuple(source_bones), tuple(target_bones))
+	if key not in compiled_mappings:
+		target_index = {b:i for i, b in enumerate(target_bones)}
+		mapping = np.full(len(target_bones), -1, dtype = np.int32)
+		for i, bone in enumerate(source_bones):
+			target = target_index.get(remap_name(bone, table) if table else bone)
+			if target is not None and mapping[target] < 0:
+				mapping[target] = i
+		compiled_mappings[key] = mapping
+	return compiled_mappings[key]
+
+def mapped_curves(clip, rig_bones, mapping, concerned = None):
+
+	# Curves of a whole action in the rig's bone order, (bone, data path, index, rows), as CurveCore.clip_curves.
+	# rig_bones: (name, rotation mode) of the rig bones. mapping: compile_mapping of the clip bones onto them.
+	# concerned: set of the clip bones to key (all by default). The keys of every mapped channel are gathered
+	# into one (n, 6) block, then sliced per curve. The other rig bones get a rest key at frame 0.
+	sources = [(bone, list(channels.values())) for bone, channels in clip.bones.items()]
+
+	curves = []
+	gathered = []
+	for (bone, mode), source in zip(rig_bones, mapping):
+		if source >= 0 and (concerned is None or sources[source][0] in concerned):
+			for c in sources[source][1]:
+				data_path, index = channel_paths[c.name]
+				gathered.append((len(curves), c))
+				curves.append((bone, data_path, index))
+		else:
+			curves += rest_curves(bone, mode)
+
+	if not gathered:
+		return curves
+
+	channels = [c for slot, c in gathered]
+	rows = np.empty((sum(len(c) for c in channels), KEY_FIELDS + 1))
+	rows[:, 0] = np.concatenate([c.times for c in channels])
+	rows[:, 1:] = np.concatenate([c.data for c in channels])
+	bounds = np.cumsum([0] + [len(c) for c in channels]).tolist()
+	for i, (slot, c) in enumerate(gathered):
+		curves[slot] = curves[slot] + (rows[bounds[i]:bounds[i + 1]],)
+	return curves
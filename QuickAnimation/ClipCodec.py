@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from ClipFormat import Clip, read_clip, select_bones, encode_toc, KEY_FIELDS, KEY_DTYPE
+from ClipPack import library_files, clip_name
+
+# Lossy codec for clips, with a maximum error per channel type.
+#
+#   magic | version | toc length | toc (json) | zlib(arrays)
+#
+# - the clip's distinct time axes are delta-encoded integers (raw float32 if a clip has sub-frame keys),
+# - values are quantized per channel: value = min + q*step, with step = 2*max error,
+# - quaternion bones whose four channels share their time axis use 'smallest three':
+#   the largest component is dropped and rebuilt from the unit norm, the three others are quantized on [-1/sqrt(2), 1/sqrt(2)],
+# - handles are stored as float16 offsets from their key.
+# Every array is decoded for the whole clip at once.
+
+MAGIC = b'QCLZP'
+VERSION = 2
+HEADER = struct.Struct('<5sBI')
+
+DEFAULT_ERRORS = {'location':1e-4, 'quaternion':1e-4, 'euler':1e-4}
+
+# Smallest maximum error accepted: values are float32, and quantization divides by the error.
+MIN_ERROR = 1e-6
+
+quaternion_channels = ['QW', 'QX', 'QY', 'QZ']
+small_range = 1./np.sqrt(2.)
+
+
+def channel_type(name):
+
+	if name.startswith('Loc'):
+		return 'location'
+	if name.startswith('Q') or name.startswith('Rot'):
+		return 'quaternion'
+	return 'euler'
+
+def smallest_dtype(maximum):
+
+	for dtype in [np.uint8, np.uint16, np.uint32]:
+		if maximum <= np.iinfo(dtype).max:
+			return np.dtype(dtype)
+	raise ValueError('Error too small for the range of values')
+
+def ranges(starts, counts):
+
+	# Concatenation of arange(start, start + count) for every channel, without a Python loop.
+	counts = np.asarray(counts, dtype = np.int64)
+	first = np.asarray(starts, dtype = np.int64)[counts > 0]
+	counts = counts[counts > 0]
+	total = int(counts.sum())
+	if total == 0:
+		return np.zeros(0, dtype = np.int64)
+	steps = np.ones(total, dtype = np.int64)
+	heads = np.cumsum(counts)[:-1]
+	steps[0] = first[0]
+	steps[heads] = first[1:] - (first[:-1] + counts[:-1] - 1)
+	return np.cumsum(steps)
+
+
+def encode_smallest_three(quats, error):
+
+	# quats: (n, 4). Returns the index/sign byte and the three quantized small components.
+	largest = np.argmax(np.abs(quats), axis = 1)
+	negative = quats[np.arange(len(quats)), largest] < 0.
+	keep = np.ones(quats.shape, dtype = bool)
+	keep[np.arange(len(quats)), largest] = False
+	small = quats[keep].reshape(-1, 3)
+
+	# Rebuilding the largest component amplifies the error on the small ones: quantize them 5 times finer.
+	step = 2.*error/5.
+	q = np.round((np.clip(small, -small_range, small_range) + small_range)/step)
+	meta = (largest + 4*negative).astype(np.uint8)
+	return meta, q, step
+
+def decode_smallest_three(meta, q, step):
+
+	small = q*step - small_range
+	largest = meta & 3
+	negative = meta >= 4
+
+	quats = np.zeros((len(meta), 4))
+	keep = np.ones(quats.shape, dtype = bool)
+	keep[np.arange(len(meta)), largest] = False
+	quats[keep] = small.reshape(-1)
+	big = np.sqrt(np.clip(1. - (small*small).sum(axis = 1), 0., 1.))
+	quats[np.arange(len(meta)), largest] = np.where(negative, -big, big)
+	return quats
+
+
+def channel_table(toc):
+
+	# Flat lists over every channel, in toc order.
+	table = {'bone':[], 'name':[], 'start':[], 'count':[], 'axis':[]}
+	for bone, mode, entries in toc['bones']:
+		for name, start, count, axis in entries:
+			table['bone'].append(bone)
+			table['name'].append(name)
+			table['start'].append(start)
+			table['count'].append(count)
+			table['axis'].append(axis)
+	return table
+
+def key_times(toc, times):
+
+	# Time of every key, expanded from the interned axes.
+	table = channel_table(toc)
+	axis_starts = [toc['axes'][a][0] for a in table['axis']]
+	return times[ranges(axis_starts, table['count'])]
+
+def encode_clip(clip, errors = None):
+
+	errors = dict(DEFAULT_ERRORS, **(errors or {}))
+	for kind, error in errors.items():
+		if not error >= MIN_ERROR:
+			raise ValueError('Maximum {} error must be at least {}, got {}'.format(kind, MIN_ERROR, error))
+	toc, axis_list, data = clip.layout()
+	times = np.concatenate(axis_list).astype(np.float64) if axis_list else np.zeros(0)
+	keys = np.concatenate(data).astype(np.float64) if data else np.zeros((0, KEY_FIELDS))
+	table = channel_table(toc)
+
+	integer_times = bool(np.all(times == np.round(times)))
+
+	arrays = []
+	if integer_times:
+		# Only the distinct time axes are stored. The first delta of an axis is its absolute time.
+		deltas = np.diff(np.concatenate([[0.], times])).astype(np.int64)
+		heads = np.array([s for s, n in toc['axes'] if n > 0], dtype = np.int64)
+		deltas[heads] = times[heads].astype(np.int64)
+		time_dtype = np.int16 if len(deltas) == 0 or np.abs(deltas).max() < 2**15 else np.int32
+		arrays.append(('times', deltas.astype(time_dtype)))
+	else:
+		arrays.append(('times', times.astype(np.float32)))
+
+	# Quaternion bones whose four channels share one time axis are stored as smallest three.
+	packed_bones = []
+	packed_rows = []
+	for bone, mode, entries in toc['bones']:
+		positions = {name:(start, count, axis) for name, start, count, axis in entries}
+		if mode != 'QUATERNION' or not all(c in positions for c in quaternion_channels):
+			continue
+		if len(set(positions[c][2] for c in quaternion_channels)) != 1 or positions['QW'][1] == 0:
+			continue
+
+		rows = np.stack([np.arange(positions[c][0], positions[c][0] + positions[c][1]) for c in quaternion_channels], axis = 1)
+		quats = keys[rows, 0]
+		# Only (nearly) unit quaternions can drop a component: check the bone round trips within the error.
+		meta, q, step = encode_smallest_three(quats, errors['quaternion'])
+		if np.abs(decode_smallest_three(meta, q, step) - quats).max() <= errors['quaternion']:
+			packed_bones.append(bone)
+			packed_rows.append(rows)
+
+	packed = set(packed_bones)
+	step = 0.
+	if packed_rows:
+		meta, q, step = encode_smallest_three(keys[np.concatenate(packed_rows), 0], errors['quaternion'])
+		arrays.append(('quat_meta', meta))
+		arrays.append(('quat_small', q.astype(smallest_dtype(q.max() if q.size else 0))))
+
+	# Every other channel: scalar quantization, one stream per channel type.
+	channel_types = {}
+	for bone, name, start, count in zip(table['bone'], table['name'], table['start'], table['count']):
+		if not (bone in packed and name in quaternion_channels):
+			channel_types.setdefault(channel_type(name), []).append((start, count))
+
+	for kind in sorted(channel_types):
+		values = [keys[s:s + n, 0] for s, n in channel_types[kind]]
+		minimums = np.array([v.min() if len(v) else 0. for v in values])
+		q = [np.round((v - lo)/(2.*errors[kind])) for v, lo in zip(values, minimums)]
+		q = np.concatenate(q) if q else np.zeros(0)
+		arrays.append((kind + '_min', minimums))
+		arrays.append((kind + '_q', q.astype(smallest_dtype(q.max() if q.size else 0))))
+
+	# Handles as float16 offsets from their key.
+	points = np.column_stack((key_times(toc, times), keys[:, 0]))
+	handles = np.concatenate([keys[:, 1:3] - points, keys[:, 3:5] - points], axis = 1)
+	arrays.append(('handles', handles.astype(np.float16)))
+
+	toc['codec'] = {
+		'errors':errors,
+		'integer_times':integer_times,
+		'packed_bones':packed_bones,
+		'quat_step':step,
+		'arrays':[[name, a.dtype.str, a.shape] for name, a in arrays],
+	}
+
+	payload = zlib.compress(b''.join(a.tobytes() for name, a in arrays), 6)
+	return toc, payload
+
+def decode_clip(toc, payload):
+
+	codec = toc['codec']
+	data = zlib.decompress(payload)
+
+	arrays = {}
+	offset = 0
+	for name, dtype, shape in codec['arrays']:
+		dtype = np.dtype(dtype)
+		count = int(np.prod(shape))
+		arrays[name] = np.frombuffer(data, dtype = dtype, count = count, offset = offset).reshape(shape)
+		offset += count*dtype.itemsize
+
+	table = channel_table(toc)
+	packed = set(codec['packed_bones'])
+	spans = {}
+	for bone, name, start, count in zip(table['bone'], table['name'], table['start'], table['count']):
+		if bone in packed and name in quaternion_channels:
+			spans.setdefault(name, []).append((start, count))
+		else:
+			spans.setdefault(channel_type(name), []).append((start, count))
+
+	times = arrays['times'].astype(np.float64)
+	axes = [(s, n) for s, n in toc['axes'] if n > 0]
+	if codec['integer_times'] and axes:
+		# Per axis cumulative sum.
+		total = np.cumsum(times)
+		heads = np.array([s for s, n in axes])
+		times = total - np.repeat(total[heads] - times[heads], [n for s, n in axes])
+
+	keys = np.empty((toc['n_keys'], KEY_FIELDS), dtype = np.float64)
+
+	for kind, kind_spans in spans.items():
+		if kind in quaternion_channels:
+			continue
+		kind_counts = [n for s, n in kind_spans]
+		rows = ranges([s for s, n in kind_spans], kind_counts)
+		keys[rows, 0] = arrays[kind + '_q']*(2.*codec['errors'][kind]) + np.repeat(arrays[kind + '_min'], kind_counts)
+
+	if packed:
+		# Packed quaternions are stored bone after bone, in toc order, as (QW, QX, QY, QZ) rows.
+		quats = decode_smallest_three(arrays['quat_meta'], arrays['quat_small'].astype(np.float64), codec['quat_step'])
+		columns = [ranges([s for s, n in spans[c]], [n for s, n in spans[c]]) for c in quaternion_channels]
+		keys[np.stack(columns, axis = 1), 0] = quats
+
+	points = np.column_stack((key_times(toc, times), keys[:, 0]))
+	handles = arrays['handles'].astype(np.float64)
+	keys[:, 1:3] = points + handles[:, 0:2]
+	keys[:, 3:5] = points + handles[:, 2:4]
+
+	return Clip.from_blocks(toc, times.astype(KEY_DTYPE), keys.astype(KEY_DTYPE))
+
+def save_compressed(clip, path, errors = None):
+
+	toc, payload = encode_clip(clip, errors)
+	toc = encode_toc(toc)
+
+	with open(path, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, VERSION, len(toc)))
+		f.write(toc)
+		f.write(payload)
+
+def load_compressed(path, bones = None):
+
+	with open(path, 'rb') as f:
+		data = f.read()
+
+	magic, version, toc_length = HEADER.unpack_from(data)
+	if magic != MAGIC:
+		raise ValueError('Not a compressed clip file')
+	if version != VERSION:
+		raise ValueError('Unsupported compressed clip version {}'.format(version))
+
+	toc = json.loads(data[HEADER.size:HEADER.size + toc_length].decode('utf-8'))
+	clip = decode_clip(toc, data[HEADER.size + toc_length:])
+	if bones:
+		# The payload is compressed as a whole: masking happens after decoding.
+		toc, axis_list, data = clip.layout()
+		clip = Clip.from_blocks(select_bones(toc, bones), np.concatenate(axis_list), np.concatenate(data))
+	return clip
+
+def is_compressed_file(path):
+
+	with open(path, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+def max_errors(reference, clip):
+
+	# Largest value error per channel type, and largest handle error.
+	errors = {}
+	for bone, channels in reference.bones.items():
+		for name, c in channels.items():
+			d = clip.channel(bone, name)
+			kind = channel_type(name)
+			errors[kind] = max(errors.get(kind, 0.), float(np.abs(c.values - d.values).max()))
+			errors['handles'] = max(errors.get('handles', 0.), float(np.abs(c.keys[:, 2:] - d.keys[:, 2:]).max()))
+			errors['times'] = max(errors.get('times', 0.), float(np.abs(c.times - d.times).max()))
+	return errors
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Compress an animation library with the quantized clip codec')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('output', help = 'Folder receiving the compressed clips')
+	parser.add_argument('--location-error', type = float, default = DEFAULT_ERRORS['location'])
+	parser.add_argument('--rotation-error', type = float, default = DEFAULT_ERRORS['quaternion'])
+	args = parser.parse_args()
+
+	errors = {'location':args.location_error, 'quaternion':args.rotation_error, 'euler':args.rotation_error}
+	total_in = 0
+	total_out = 0
+	for source in library_files(args.folder):
+		name = clip_name(args.folder, source)
+		target = os.path.join(args.output, name + '.qclz')
+		if not os.path.isdir(os.path.dirname(target)):
+			os.makedirs(os.path.dirname(target))
+
+		clip = read_clip(source, name)
+		save_compressed(clip, target, errors)
+		measured = max_errors(clip, load_compressed(target))
+
+		total_in += os.path.getsize(source)
+		total_out += os.path.getsize(target)
+		print('{:<40} {:>9} -> {:>8} bytes  {}'.format(name, os.path.getsize(source), os.path.getsize(target),
+			' '.join('{} {:.2e}'.format(k, v) for k, v in sorted(measured.items()))))
+
+	print('{} -> {} bytes ({:.1f}%)'.format(total_in, total_out, 100.*total_out/max(total_in, 1)))
@@ -0,0 +1,405 @@
+import json
+import pickle
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from BoneGroups import resolve_bones
+
+# Columnar clip format.
+# Key times are interned: every distinct time axis (e.g. [0, 8, 12, 22, 30, 34, 44], shared by most channels of a clip)
+# is stored once in a float32 times block, and channels point to it.
+# Every key of every channel is one float32 row: (value, left handle x, left handle y, right handle x, right handle y).
+# Rows of a channel are contiguous, channels of a bone are contiguous, so the keys of a clip are a single (n_keys, 5) block.
+#
+#   magic | version | toc length | toc (json) | padding | times block | padding | keys block
+#
+# toc = {'name':..., 'meta':{...}, 'n_times': T, 'n_keys': K, 'axes': [[start, count], ...],
+#        'bones': [[bone, mode, [[channel, start, count, axis], ...]], ...]}
+#
+# Version 1 files had no times block and stored the key time as the first of 6 columns. They can still be read.
+
+MAGIC = b'QCLIP'
+VERSION = 2
+HEADER = struct.Struct('<5sBI')
+ALIGN = 16
+
+KEY_FIELDS = 5
+KEY_DTYPE = np.dtype('<f4')
+KEY_SIZE = KEY_FIELDS*KEY_DTYPE.itemsize
+TIME_SIZE = KEY_DTYPE.itemsize
+
+# Rotation mode of euler bones read from the old dicts, which do not say the euler order they were keyed in.
+UNKNOWN_EULER = 'EULER'
+
+# Quaternion channel names of the old 7 curves files, renamed on reading.
+legacy_channels = {'RotW':'QW', 'RotX':'QX', 'RotY':'QY', 'RotZ':'QZ'}
+
+
+class Channel():
+
+	# A channel is a time axis (possibly shared with other channels) and a (start, count) window on a key block.
+	# The key view is only sliced when asked for.
+	__slots__ = ['name', 'times', 'block', 'start', 'count']
+
+	def __init__(self, name, times, block, start = 0, count = None):
+
+		self.name = name
+		self.times = times
+		self.block = block
+		self.start = start
+		self.count = block.shape[0] if count is None else count
+
+	def __len__(self):
+		return self.count
+
+	@property
+	def data(self):
+		return self.block[self.start:self.start + self.count]
+
+	@property
+	def values(self):
+		return self.data[:, 0]
+
+	@property
+	def handle_left(self):
+		return self.data[:, 1:3]
+
+	@property
+	def handle_right(self):
+		return self.data[:, 3:5]
+
+	@property
+	def keys(self):
+		# (time, value, handles) rows, as in version 1. This is a copy.
+		return np.column_stack((self.times, self.data))
+
+	@property
+	def frames(self):
+		return self.times.astype(np.int32)
+
+	def __repr__(self):
+		return 'Channel {} - {} keys'.format(self.name, len(self))
+
+
+class Clip():
+
+	def __init__(self, name = '', meta = None):
+
+		self.name = name
+		self.meta = meta if meta is not None else {}
+		self.bones = OrderedDict()
+		self.modes = {}
+		self.axes = {}
+
+	def __contains__(self, bone):
+		return bone in self.bones
+
+	def __repr__(self):
+		return 'Clip {} - {} bones - {} keys'.format(self.name, len(self.bones), self.n_keys)
+
+	@property
+	def n_keys(self):
+		return sum(len(c) for channels in self.bones.values() for c in channels.values())
+
+	def intern(self, times):
+
+		# Identical time axes share one array.
+		times = np.ascontiguousarray(times, dtype = KEY_DTYPE)
+		return self.axes.setdefault(times.tobytes(), times)
+
+	def add_channel(self, bone, mode, name, keys, times = None):
+
+		# keys: (n, 6) rows of (time, value, handles), or (n, 5) rows of (value, handles) when times are given.
+		if bone not in self.bones:
+			self.bones[bone] = OrderedDict()
+			self.modes[bone] = mode
+
+		keys = np.asarray(keys, dtype = KEY_DTYPE)
+		if times is None:
+			keys = keys.reshape(-1, KEY_FIELDS + 1)
+			times, keys = keys[:, 0], keys[:, 1:]
+
+		data = np.ascontiguousarray(keys).reshape(-1, KEY_FIELDS)
+		self.bones[bone][name] = Channel(name, self.intern(times), data)
+
+	def channel(self, bone, name):
+		return self.bones[bone][name]
+
+	def channels(self, bone):
+		return self.bones[bone]
+
+	def layout(self):
+
+		# Returns the toc, the distinct time axes and the key arrays, in file order.
+		axes = OrderedDict()
+		axis_list = []
+		data = []
+		bones = []
+		start = 0
+		time_start = 0
+		for bone, channels in self.bones.items():
+			entries = []
+			for name, c in channels.items():
+				key = c.times.tobytes()
+				if key not in axes:
+					axes[key] = [len(axes), time_start, len(c.times)]
+					axis_list.append(c.times)
+					time_start += len(c.times)
+				entries.append([name, start, len(c), axes[key][0]])
+				data.append(c.data)
+				start += len(c)
+			bones.append([bone, self.modes[bone], entries])
+
+		toc = {
+			'name':self.name,
+			'meta':self.meta,
+			'n_times':time_start,
+			'n_keys':start,
+			'axes':[a[1:] for a in axes.values()],
+			'bones':bones,
+		}
+		return toc, axis_list, data
+
+	def toc(self):
+		return self.layout()[0]
+
+	def payload(self):
+
+		# Times block and keys block, as laid out after the header.
+		toc, axis_list, data = self.layout()
+		times = concatenate(axis_list, (0,)).tobytes()
+		return times + b'\0'*pad(len(times)) + concatenate(data, (0, KEY_FIELDS)).tobytes()
+
+	def block(self):
+
+		# All keys as (time, value, handles) rows.
+		toc, axis_list, data = self.layout()
+		times = [axis_list[e[3]] for b in toc['bones'] for e in b[2]]
+		return np.column_stack((concatenate(times, (0,)), concatenate(data, (0, KEY_FIELDS))))
+
+	@classmethod
+	def from_blocks(cls, toc, times, keys):
+
+		# Channels are views on the blocks: nothing is copied, every axis is shared.
+		clip = cls(toc['name'], toc['meta'])
+		axes = [times[s:s + n] for s, n in toc['axes']]
+		for bone, mode, entries in toc['bones']:
+			clip.bones[bone] = OrderedDict()
+			clip.modes[bone] = mode
+			for name, start, count, axis in entries:
+				clip.bones[bone][name] = Channel(name, axes[axis], keys, start, count)
+
+		return clip
+
+	@classmethod
+	def from_buffer(cls, toc, buffer, offset = 0):
+
+		times = frombuffer(buffer, toc['n_times'], offset)
+		keys = frombuffer(buffer, toc['n_keys']*KEY_FIELDS, offset + keys_offset(toc)).reshape(-1, KEY_FIELDS)
+		return cls.from_blocks(toc, times, keys)
+
+	@classmethod
+	def from_block(cls, toc, block):
+
+		# Version 1: (time, value, handles) rows, times are interned while reading.
+		clip = cls(toc['name'], toc['meta'])
+		for bone, mode, entries in toc['bones']:
+			for name, start, count in entries:
+				rows = block[start:start + count]
+				clip.add_channel(bone, mode, name, rows[:, 1:], rows[:, 0])
+
+		return clip
+
+	@classmethod
+	def from_dict(cls, data, name = '', bones = None):
+
+		# data is the nested dict written by QuickTransfer.save_dict (see dict_channels).
+		# The points of all channels are converted at once into one block, channels are views on it.
+		clip = cls(name)
+		channels = list(dict_channels(data, bones))
+		block = np.array([row for bone, mode, channel, rows in channels for row in rows], dtype = KEY_DTYPE).reshape(-1, KEY_FIELDS + 1)
+		times = np.ascontiguousarray(block[:, 0])
+		keys = np.ascontiguousarray(block[:, 1:])
+
+		start = 0
+		for bone, mode, channel, rows in channels:
+			if bone not in clip.bones:
+				clip.bones[bone] = OrderedDict()
+				clip.modes[bone] = mode
+			clip.bones[bone][channel] = Channel(channel, clip.intern(times[start:start + len(rows)]), keys, start, len(rows))
+			start += len(rows)
+
+		return clip
+
+	def to_dict(self):
+
+		data = {}
+		for bone, channels in self.bones.items():
+			data[bone] = {}
+			for name, c in channels.items():
+				rows = c.keys.tolist()
+				points = [{'p':r[0:2], 'lh':r[2:4], 'rh':r[4:6]} for r in rows]
+				data[bone][name] = {'points':points, 'frames':c.frames.tolist()}
+
+		return data
+
+
+class DictUnpickler(pickle.Unpickler):
+
+	# The dicts written by save_dict only hold dicts, lists, strings and numbers: nothing may be imported,
+	# so a file asking for a module or a function is refused instead of running code.
+	allowed = {}
+
+	def find_class(self, module, name):
+
+		if (module, name) in self.allowed:
+			return self.allowed[(module, name)]
+		raise pickle.UnpicklingError('Refusing to load {}.{}'.format(module, name))
+
+
+def dict_channels(data, bones = None):
+
+	# (bone, mode, channel, rows) of every channel of a dict written by save_dict, in file order:
+	# bone -> channel -> {'points':[{'p', 'lh', 'rh'}...], 'frames':[...]}
+	# rows: [frame, value, left x, left y, right x, right y] lists of the saved floats.
+	for bone in resolve_bones(data.keys(), bones):
+		channels = data[bone]
+		mode = 'QUATERNION' if 'QW' in channels or 'RotW' in channels else UNKNOWN_EULER
+		for channel, curve in channels.items():
+			yield bone, mode, legacy_channels.get(channel, channel), [p['p'] + p['lh'] + p['rh'] for p in curve['points']]
+
+def load_pickle(path):
+
+	with open(path, 'rb') as f:
+		return DictUnpickler(f).load()
+
+def pad(length):
+	return (-length) % ALIGN
+
+def data_offset(toc_length):
+
+	offset = HEADER.size + toc_length
+	return offset + pad(offset)
+
+def keys_offset(toc):
+
+	# Offset of the keys block from the start of the times block.
+	size = toc['n_times']*TIME_SIZE
+	return size + pad(size)
+
+def payload_size(toc):
+	return keys_offset(toc) + toc['n_keys']*KEY_SIZE
+
+def concatenate(arrays, empty_shape):
+
+	if not arrays:
+		return np.zeros(empty_shape, dtype = KEY_DTYPE)
+	return np.concatenate(arrays).astype(KEY_DTYPE, copy = False)
+
+def frombuffer(buffer, count, offset):
+
+	if count == 0:
+		return np.zeros(0, dtype = KEY_DTYPE)
+	return np.frombuffer(buffer, dtype = KEY_DTYPE, count = count, offset = offset)
+
+def encode_toc(toc):
+	return json.dumps(toc, separators = (',', ':')).encode('utf-8')
+
+def save_clip(clip, path):
+
+	toc = encode_toc(clip.toc())
+	header = HEADER.pack(MAGIC, VERSION, len(toc))
+
+	with open(path, 'wb') as f:
+		f.write(header)
+		f.write(toc)
+		f.write(b'\0'*pad(len(header) + len(toc)))
+		f.write(clip.payload())
+
+def parse_header(buffer):
+
+	magic, version, toc_length = HEADER.unpack_from(buffer)
+	if magic != MAGIC:
+		raise ValueError('Not a clip file')
+	if version not in (1, VERSION):
+		raise ValueError('Unsupported clip version {}'.format(version))
+
+	toc = json.loads(bytes(buffer[HEADER.size:HEADER.size + toc_length]).decode('utf-8'))
+	return toc, data_offset(toc_length), version
+
+def read_toc(f):
+
+	header = f.read(HEADER.size)
+	_, _, toc_length = HEADER.unpack(header)
+	return parse_header(header + f.read(toc_length))
+
+def select_bones(toc, bones):
+
+	# Same toc restricted to the bones matched by the mask (names, groups or patterns, see BoneGroups).
+	keep = set(resolve_bones([b[0] for b in toc['bones']], bones))
+	selected = dict(toc)
+	selected['bones'] = [b for b in toc['bones'] if b[0] in keep]
+	return selected
+
+def load_bones(f, toc, offset, bones):
+
+	# The time axes are read whole (they are few). The keys of a bone are contiguous: one seek and one read per requested bone.
+	selected = select_bones(toc, bones)
+	f.seek(offset)
+	times = frombuffer(f.read(toc['n_times']*TIME_SIZE), toc['n_times'], 0)
+
+	parts = []
+	table = []
+	start = 0
+	for bone, mode, entries in selected['bones']:
+		if not entries:
+			continue
+		first = entries[0][1]
+		count = sum(e[2] for e in entries)
+		f.seek(offset + keys_offset(toc) + first*KEY_SIZE)
+		parts.append(f.read(count*KEY_SIZE))
+		table.append([bone, mode, [[c, s - first + start, n, a] for c, s, n, a in entries]])
+		start += count
+
+	selected['bones'] = table
+	selected['n_keys'] = start
+	keys = frombuffer(b''.join(parts), start*KEY_FIELDS, 0).reshape(-1, KEY_FIELDS)
+	return Clip.from_blocks(selected, times, keys)
+
+def load_v1(data, toc, offset, bones):
+
+	block = np.frombuffer(data, dtype = KEY_DTYPE, count = toc['n_keys']*6, offset = offset).reshape(-1, 6)
+	return Clip.from_block(select_bones(toc, bones) if bones else toc, block)
+
+def load_clip(path, bones = None):
+
+	with open(path, 'rb') as f:
+		toc, offset, version = read_toc(f)
+		if bones and version == VERSION:
+			return load_bones(f, toc, offset, bones)
+		f.seek(0)
+		data = f.read()
+
+	if version == 1:
+		return load_v1(data, toc, offset, bones)
+	return Clip.from_buffer(toc, data, offset)
+
+def is_clip_file(path):
+
+	with open(path, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+def read_clip(path, name = '', bones = None):
+
+	# Loads any format: the columnar one, a compressed one (ClipCodec.py), or the legacy pickled dict.
+	# A legacy pickle has to be parsed in full, only the conversion is restricted to the masked bones.
+	if is_clip_file(path):
+		return load_clip(path, bones)
+
+	import ClipCodec
+	if ClipCodec.is_compressed_file(path):
+		return ClipCodec.load_compressed(path, bones)
+
+	return Clip.from_dict(load_pickle(path), name, bones)
@@ -0,0 +1,170 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from ClipFormat import Clip, read_clip, select_bones, encode_toc, pad, keys_offset, payload_size, KEY_SIZE
+
+# Pack file: a whole animation library in one file, meant to be opened with mmap.
+#
+#   magic | version | index length | index (json) | padding | clip payloads (each aligned to 16 bytes)
+#
+# index = {'clips': {clip name: {'offset': byte offset of the clip payload from the data start, 'toc': clip toc}}}
+# A clip payload is laid out as in a clip file (times block, then keys block). The toc gives each channel's first key
+# and key count, so a channel's keys live at data start + offset + keys_offset(toc) + start*KEY_SIZE
+# and are count*KEY_SIZE bytes long.
+
+MAGIC = b'QPACK'
+VERSION = 2
+HEADER = struct.Struct('<5sBI')
+
+
+def is_pack_file(path):
+
+	if not os.path.isfile(path):
+		return False
+	with open(path, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+def library_files(folder):
+
+	files = []
+	for root, dirs, names in os.walk(folder):
+		dirs.sort()
+		for n in sorted(names):
+			if n.endswith('.md') or n.startswith('.'):
+				continue
+			files.append(os.path.join(root, n))
+
+	return files
+
+def clip_name(folder, path):
+	return os.path.relpath(path, folder).replace(os.sep, '/')
+
+def build_pack(folder, path):
+
+	# Builds from any clip file in the folder: legacy pickles or clip files.
+	# Clip files keep the name they were saved with (often '' or a reused one): the index goes by path in the folder.
+	clips = []
+	for f in library_files(folder):
+		name = clip_name(folder, f)
+		clips.append((name, read_clip(f, name)))
+
+	index = {'clips':{}}
+	offset = 0
+	for name, clip in clips:
+		toc = clip.toc()
+		index['clips'][name] = {'offset':offset, 'toc':toc}
+		size = payload_size(toc)
+		offset += size + pad(size)
+
+	index = encode_toc(index)
+	header = HEADER.pack(MAGIC, VERSION, len(index))
+
+	with open(path, 'wb') as f:
+		f.write(header)
+		f.write(index)
+		f.write(b'\0'*pad(len(header) + len(index)))
+		for name, clip in clips:
+			payload = clip.payload()
+			f.write(payload)
+			f.write(b'\0'*pad(len(payload)))
+
+	print('Packed {} clips into {}'.format(len(clips), path))
+	return path
+
+
+class Pack():
+
+	def __init__(self, path):
+
+		self.path = path
+		self.file = open(path, 'rb')
+		self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+		magic, version, index_length = HEADER.unpack_from(self.map)
+		if magic != MAGIC:
+			raise ValueError('Not a pack file: {}'.format(path))
+		if version != VERSION:
+			raise ValueError('Unsupported pack version {}'.format(version))
+
+		self.index = json.loads(self.map[HEADER.size:HEADER.size + index_length].decode('utf-8'))['clips']
+		start = HEADER.size + index_length
+		self.data_start = start + pad(start)
+
+		# Short names ('SanRun') work as long as they are unique in the pack.
+		self.short_names = {}
+		for name in self.index:
+			short = name.split('/')[-1]
+			self.short_names[short] = name if short not in self.short_names else None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __contains__(self, name):
+		return self.resolve(name) is not None
+
+	def names(self):
+		return list(self.index.keys())
+
+	def resolve(self, name):
+
+		if name in self.index:
+			return name
+		return self.short_names.get(name)
+
+	def entry(self, name):
+
+		full_name = self.resolve(name)
+		if full_name is None:
+			raise KeyError('No clip {} in {}'.format(name, self.path))
+		return self.index[full_name]
+
+	def toc(self, name):
+		return self.entry(name)['toc']
+
+	def clip(self, name, bones = None):
+
+		# Zero-copy: channel keys are views on the mapped file.
+		# With a bone mask, only the pages of the masked bones are ever touched.
+		entry = self.entry(name)
+		toc = select_bones(entry['toc'], bones) if bones else entry['toc']
+		return Clip.from_buffer(toc, self.map, self.data_start + entry['offset'])
+
+	def channel_span(self, name, bone, channel):
+
+		# Byte offset/length of one channel in the pack file.
+		entry = self.entry(name)
+		keys_start = self.data_start + entry['offset'] + keys_offset(entry['toc'])
+		for b, mode, entries in entry['toc']['bones']:
+			if b != bone:
+				continue
+			for c, start, count, axis in entries:
+				if c == channel:
+					return keys_start + start*KEY_SIZE, count*KEY_SIZE
+
+		raise KeyError('No channel {} {} in {}'.format(bone, channel, name))
+
+	def close(self):
+
+		# The map stays open while clips still hold views on it (it is released with the last of them),
+		# the file is closed either way.
+		try:
+			self.map.close()
+		except BufferError:
+			pass
+		self.file.close()
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Pack an animation library into a single memory-mappable file')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('output', help = 'Pack file to write')
+	args = parser.parse_args()
+
+	build_pack(args.folder, args.output)
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from ClipFormat import Clip, DictUnpickler, dict_channels, save_clip, load_clip, is_clip_file, KEY_DTYPE
+from CurveCore import map_library
+
+# Converts a library of legacy animation files to the clip format (ClipFormat.py), without Blender.
+# Three legacy encodings are recognised:
+#   'flat'      list of {'points', 'frames'} curves, 7 per bone (FCurvesOperator.save_all)
+#   'structure' list of pickled Saver.CurveStructure / Saver.Point objects (F-curves Saver/Saver.py)
+#   'dict'      bone -> channel -> {'points', 'frames'} (FCurvesOperatorAll.save_dict, QuickTransfer.save_dict)
+# The flat and structure encodings do not record bone names: bones are named 'Bone 0', 'Bone 1'...
+# unless a list of names is given (Humanoid.bones_names of the rig that saved them).
+
+curve_dico = {0: 'LocX',
+			  1: 'LocY',
+			  2: 'LocZ',
+			  3: 'QW',
+			  4: 'QX',
+			  5: 'QY',
+			  6: 'QZ'
+			  }
+
+
+class Point():
+	pass
+
+class CurveStructure():
+	pass
+
+
+class LegacyUnpickler(DictUnpickler):
+
+	# Saver.py imports bpy: its classes are replaced by plain stand-ins. Nothing else may be imported.
+	allowed = {('Saver', 'Point'):Point, ('Saver', 'CurveStructure'):CurveStructure}
+
+
+def read_legacy(path):
+
+	with open(path, 'rb') as f:
+		return LegacyUnpickler(f).load()
+
+def sniff(data):
+
+	if isinstance(data, dict):
+		return 'dict'
+	if isinstance(data, list) and data:
+		if isinstance(data[0], CurveStructure):
+			return 'structure'
+		if isinstance(data[0], dict) and 'points' in data[0]:
+			return 'flat'
+	raise ValueError('Unknown animation encoding')
+
+def bone_name(bone_names, nb):
+
+	if bone_names is not None and nb < len(bone_names):
+		return bone_names[nb]
+	return 'Bone {}'.format(nb)
+
+def legacy_keys(encoding, data):
+
+	# Yields (bone, mode, channel, rows) in file order, rows as float64 lists, untouched.
+	if encoding == 'dict':
+		for channel in dict_channels(data):
+			yield channel
+
+	elif encoding == 'flat':
+		for i, curve in enumerate(data):
+			rows = [p['p'] + p['lh'] + p['rh'] for p in curve['points']]
+			yield i//7, 'QUATERNION', curve_dico[i%7], rows
+
+	elif encoding == 'structure':
+		for i, curve in enumerate(data):
+			rows = [list(p.point) + list(p.left_handle) + list(p.right_handle) for p in curve.points]
+			yield i//7, 'QUATERNION', curve_dico[i%7], rows
+
+def to_clip(encoding, data, name, bone_names = None):
+
+	if encoding == 'dict':
+		clip = Clip.from_dict(data, name)
+		clip.meta['source'] = encoding
+		return clip
+
+	clip = Clip(name, {'source':encoding})
+	for bone, mode, channel, rows in legacy_keys(encoding, data):
+		if not isinstance(bone, str):
+			bone = bone_name(bone_names, bone)
+		clip.add_channel(bone, mode, channel, rows)
+
+	return clip
+
+def verify(encoding, data, clip, bone_names = None):
+
+	# Every legacy float64 value must come back as its float32 rounding, in the same bones and channels order.
+	found = []
+	for bone, mode, channel, rows in legacy_keys(encoding, data):
+		if not isinstance(bone, str):
+			bone = bone_name(bone_names, bone)
+		if bone not in clip.bones or channel not in clip.bones[bone]:
+			return False
+
+		expected = np.array(rows, dtype = np.float64).reshape(-1, 6)
+		keys = clip.channel(bone, channel).keys
+		if keys.shape != expected.shape or not np.array_equal(keys, expected.astype(KEY_DTYPE)):
+			return False
+		if not np.allclose(keys, expected, rtol = np.finfo(np.float32).eps, atol = np.finfo(np.float32).tiny):
+			return False
+		found.append((bone, channel))
+
+	stored = [(bone, channel) for bone, channels in clip.bones.items() for channel in channels]
+	return found == stored
+
+def convert_file(source, target, name = '', bone_names = None):
+
+	t0 = time.perf_counter()
+	data = read_legacy(source)
+	encoding = sniff(data)
+	t1 = time.perf_counter()
+
+	clip = to_clip(encoding, data, name, bone_names)
+	save_clip(clip, target)
+	t2 = time.perf_counter()
+
+	ok = verify(encoding, data, load_clip(target), bone_names)
+	t3 = time.perf_counter()
+
+	return {
+		'source':source,
+		'target':target,
+		'encoding':encoding,
+		'verified':ok,
+		'decode':t1 - t0,
+		'encode':t2 - t1,
+		'verify':t3 - t2,
+		'source_size':os.path.getsize(source),
+		'target_size':os.path.getsize(target),
+	}
+
+def convert_task(source, name, output, bone_names = None):
+
+	# Runs in a worker process (see CurveCore.map_library). Files already in the clip format are left out.
+	if is_clip_file(source):
+		return None
+
+	target = os.path.join(output, name + '.qclip')
+	os.makedirs(os.path.dirname(target), exist_ok = True)
+	return convert_file(source, target, name, bone_names)
+
+def convert_library(folder, output, bone_names = None, workers = None):
+
+	results = map_library(convert_task, folder, (output, bone_names), workers)
+	return [r for r in results if r is not None]
+
+def print_report(results):
+
+	total_in = 0
+	total_out = 0
+	for r in results:
+		if 'error' in r:
+			print('{:<50} FAILED {}'.format(r['source'], r['error']))
+			continue
+
+		total_in += r['source_size']
+		total_out += r['target_size']
+		seconds = r['decode'] + r['encode'] + r['verify']
+		print('{:<50} {:<9} {:>7.1f} ms {:>9} -> {:>9} bytes ({:>5.1f}%) {}'.format(
+			r['source'], r['encoding'], seconds*1000, r['source_size'], r['target_size'],
+			100.*r['target_size']/max(r['source_size'], 1), 'ok' if r['verified'] else 'MISMATCH'))
+
+	failed = [r for r in results if 'error' in r or not r['verified']]
+	print('{} files, {} failed. {} -> {} bytes ({:.1f}%)'.format(
+		len(results), len(failed), total_in, total_out, 100.*total_out/max(total_in, 1)))
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Convert a legacy animation library to the clip format')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('output', help = 'Folder receiving the converted clips')
+	parser.add_argument('--bones', help = 'Text file with one bone name per line, for flat and structure files')
+	parser.add_argument('--workers', type = int, default = None)
+	parser.add_argument('--report', help = 'Write the per-file results as JSON')
+	args = parser.parse_args()
+
+	bone_names = None
+	if args.bones:
+		bone_names = [l.strip() for l in open(args.bones) if l.strip()]
+
+	results = convert_library(args.folder, args.output, bone_names, args.workers)
+	print_report(results)
+
+	if args.report:
+		json.dump(results, open(args.report, 'w'), indent = 1)
@@ -0,0 +1,235 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ClipFormat import Clip, UNKNOWN_EULER
+from CurveEval import evaluate_batch
+import PoseMath
+from ClipPack import library_files, clip_name
+
+# Curve logic shared by the Blender scripts, without bpy: channel naming, key rows, length ratios.
+# Anything whose keyframe_points have foreach_get (Blender's, FakeBlender's) can be read here,
+# so clips can be built, checked and converted in plain Python processes. The Blender scripts only move data in and out.
+
+quat_dict = {0:'LocX', 1:'LocY', 2:'LocZ', 3:'QW', 4:'QX', 5:'QY', 6:'QZ' }
+xyz_dict = {0:'LocX', 1:'LocY', 2:'LocZ', 3:'EX', 4:'EY', 5:'EZ'}
+
+# Data path and index animated by each channel. RotW, RotX... are the names of the old 7 curves files.
+channel_paths = {
+	'LocX':('location', 0), 'LocY':('location', 1), 'LocZ':('location', 2),
+	'QW':('rotation_quaternion', 0), 'QX':('rotation_quaternion', 1), 'QY':('rotation_quaternion', 2), 'QZ':('rotation_quaternion', 3),
+	'RotW':('rotation_quaternion', 0), 'RotX':('rotation_quaternion', 1), 'RotY':('rotation_quaternion', 2), 'RotZ':('rotation_quaternion', 3),
+	'EX':('rotation_euler', 0), 'EY':('rotation_euler', 1), 'EZ':('rotation_euler', 2),
+}
+
+# Rest pose values of the keyed properties.
+rest_values = {
+	'location':[0., 0., 0.],
+	'rotation_quaternion':[1., 0., 0., 0.],
+	'rotation_euler':[0., 0., 0.],
+	'rotation_axis_angle':[0., 0., 1., 0.],
+}
+
+# Bones whose location is proportional to the leg or arm length (old Humanoid rigs).
+leg_sensitive = ['Foot Control L', 'Foot Control R', 'IKT Leg L', 'IKT Leg R', 'Pelvis']
+arm_sensitive = ['IK Arm L', 'IK Arm R', 'IKT Arm L', 'IKT Arm R']
+
+
+def channel_names(mode):
+	return quat_dict if mode == 'QUATERNION' else xyz_dict
+
+def rotation_path(mode):
+
+	if mode == 'QUATERNION':
+		return 'rotation_quaternion'
+	if mode == 'AXIS_ANGLE':
+		return 'rotation_axis_angle'
+	return 'rotation_euler'
+
+def legacy_path(curve_index):
+
+	# Old files hold 7 curves per bone: location then quaternion.
+	if curve_index < 3:
+		return 'location', curve_index
+	return 'rotation_quaternion', curve_index - 3
+
+def length_ratio(bone, channel_index, leg_length = 1., arm_length = 1.):
+
+	# Location channels of leg/arm driven bones scale with the rig, nothing else does.
+	if channel_index < 3:
+		if bone in leg_sensitive:
+			return leg_length
+		if bone in arm_sensitive:
+			return arm_length
+	return 1.
+
+def read_keys(c, dtype = np.float32):
+
+	# (n, 6) rows of (frame, value, left handle, right handle) of an f-curve, read with one foreach_get per attribute.
+	points = c.keyframe_points
+	rows = np.empty((len(points), 6), dtype = dtype)
+	buffer = np.empty(2*len(points), dtype = dtype)
+	for i, attr in enumerate(['co', 'handle_left', 'handle_right']):
+		points.foreach_get(attr, buffer)
+		rows[:, 2*i:2*i + 2] = buffer.reshape(-1, 2)
+
+	return rows
+
+def get_curve(c, ratio = 1.):
+
+	# Saving side of the ratio: every coordinate is divided, key frames included.
+	rows = read_keys(c)
+	if ratio != 1.:
+		rows /= ratio
+	return rows
+
+def scale_rows(rows, ratio):
+
+	# Loading side of the ratio: every coordinate is scaled back, key frames included.
+	rows = np.array(rows, dtype = np.float64).reshape(-1, 6)
+	if ratio != 1.:
+		rows *= ratio
+	return rows
+
+def rest_rows(frame, value):
+	return np.array([[frame, value, frame - 1, value, frame + 1, value]])
+
+def baked_rows(frames, values):
+
+	# Rows for computed keys: handles a third of the way to the neighbouring keys, along the slope through them,
+	# and flat on extremes and end keys (close to Blender's auto clamped handles).
+	x = np.asarray(frames, dtype = np.float64)
+	y = np.asarray(values, dtype = np.float64)
+	n = len(x)
+	slope = np.zeros(n)
+	left = np.ones(n)
+	right = np.ones(n)
+	if n > 1:
+		gaps = np.diff(x)
+		left[1:] = gaps/3.
+		right[:-1] = gaps/3.
+		left[0] = right[0]
+		right[-1] = left[-1]
+	if n > 2:
+		monotonic = (y[1:-1] - y[:-2])*(y[2:] - y[1:-1]) > 0.
+		slope[1:-1] = np.where(monotonic, (y[2:] - y[:-2])/(x[2:] - x[:-2]), 0.)
+
+	return np.column_stack((x, y, x - left, y - slope*left, x + right, y + slope*right))
+
+def rest_curves(bone, mode, frame = 0):
+
+	# (bone, data path, index, rows) of one rest pose key on the location and rotation of a bone.
+	curves = []
+	for data_path in ['location', rotation_path(mode)]:
+		for index, value in enumerate(rest_values[data_path]):
+			curves.append((bone, data_path, index, rest_rows(frame, value)))
+	return curves
+
+def clip_curves(clip, rig_bones, concerned_bones):
+
+	# Curves of a whole action, in the rig's bone order: (bone, data path, index, rows).
+	# rig_bones: (name, rotation mode) of the rig bones. Concerned bones get the clip's keys, the others a rest key at frame 0.
+	curves = []
+	for bone, mode in rig_bones:
+		if bone in clip.bones and bone in concerned_bones:
+			for name, c in clip.bones[bone].items():
+				data_path, index = channel_paths[name]
+				curves.append((bone, data_path, index, c.keys))
+		else:
+			curves += rest_curves(bone, mode)
+
+	return curves
+
+def curve_channels(groups, modes):
+
+	# groups: bone name of every f-curve, in action order. Returns (bone, channel) for each of them:
+	# the n-th curve of a bone is the n-th channel of its rotation mode, as save_dict and load_dict read them.
+	channels = []
+	current = None
+	counter = 0
+	for bone in groups:
+		if bone != current:
+			current = bone
+			counter = 0
+		names = channel_names(modes[bone])
+		channels.append((bone, names.get(counter)))
+		counter += 1
+
+	return channels
+
+def curves_to_clip(curves, modes, name = ''):
+
+	# curves: (bone name, (n, 6) rows) of every f-curve, in action order.
+	clip = Clip(name)
+	curves = list(curves)
+	for (bone, channel), (_, rows) in zip(curve_channels([c[0] for c in curves], modes), curves):
+		if channel is not None:
+			clip.add_channel(bone, modes[bone], channel, rows)
+
+	return clip
+
+def source_rotation(mode, target):
+
+	# Mode a rotation saved in mode is read in to rebuild it in target, None when its channels are kept as they are.
+	# Eulers of unknown order are the rig's own on euler bones, and Blender's default order on their way to quaternions.
+	if mode == target or 'AXIS_ANGLE' in (mode, target):
+		return None
+	if mode == UNKNOWN_EULER:
+		return 'XYZ' if target == 'QUATERNION' else None
+	return mode
+
+def convert_rotations(clip, modes):
+
+	# Copy of a clip with the rotation of the bones in modes ({clip bone: rotation mode}) rebuilt in that mode, when the
+	# clip has them in another one: the saved rotation is evaluated on its own key times, converted key by key
+	# (PoseMath.py) and keyed again with baked handles. Quaternions and euler orders only: other bones keep their channels.
+	# The clip comes back as it is when no bone changes mode.
+	sources = dict((b, source_rotation(clip.modes[b], mode)) for b, mode in modes.items())
+	if not any(sources.values()):
+		return clip
+
+	converted = Clip(clip.name, clip.meta)
+	for bone, channels in clip.bones.items():
+		mode = clip.modes[bone]
+		if not sources.get(bone):
+			for name, c in channels.items():
+				converted.add_channel(bone, mode, name, c.data, c.times)
+			continue
+
+		target = modes[bone]
+		path = rotation_path(mode)
+		rotation = {}
+		for name, c in channels.items():
+			if channel_paths[name][0] == 'location':
+				converted.add_channel(bone, target, name, c.data, c.times)
+			elif channel_paths[name][0] == path:
+				rotation[channel_paths[name][1]] = c
+
+		frames = np.unique(np.concatenate([c.times for c in rotation.values()] or [np.zeros(1)]).astype(np.float64))
+		sampled = dict(zip(rotation.keys(), evaluate_batch([(c.keys, frames) for c in rotation.values()])))
+		values = np.column_stack([sampled.get(i, np.full(len(frames), value)) for i, value in enumerate(rest_values[path])])
+
+		rotations = PoseMath.matrix_rotations(PoseMath.rotation_matrices(values, sources[bone]), target)
+		if target != 'QUATERNION':
+			rotations = np.unwrap(rotations, axis = 0)
+		names = channel_names(target)
+		for i in range(rotations.shape[1]):
+			converted.add_channel(bone, target, names[3 + i], baked_rows(frames, rotations[:, i]))
+
+	return converted
+
+def map_library(task, folder, extra = (), workers = None):
+
+	# Runs task(path, name, *extra) for every file of a library in worker processes. task must be a module level function.
+	# A failing file gives {'source', 'error'} instead of stopping the others.
+	jobs = [(task, path, clip_name(folder, path), extra) for path in library_files(folder)]
+	with ProcessPoolExecutor(max_workers = workers) as pool:
+		return list(pool.map(run_task, jobs))
+
+def run_task(job):
+
+	task, path, name, extra = job
+	try:
+		return task(path, name, *extra)
+	except Exception as e:
+		return {'source':path, 'error':'{}: {}'.format(type(e).__name__, e)}
@@ -0,0 +1,255 @@
+import argparse
+import time
+import weakref
+
+import numpy as np
+
+from ClipFormat import read_clip, concatenate, KEY_FIELDS
+from ClipPack import library_files, clip_name
+
+# Evaluates saved f-curves outside Blender: rows of (frame, value, left x, left y, right x, right y) as in CurveCore.py,
+# or the channels of a saved clip. Bezier segments between keys and constant extrapolation, as Blender does by default.
+#
+# The segments of a set of curves are prepared once (Segments): handles corrected, then x and y of every segment as
+# cubics in the curve parameter u. The curves are laid one after the other on a single time axis, so the segments under
+# any number of (curve, time) queries are found with one searchsorted, and u is solved for all queries together.
+# Sampling a clip on a fixed rate grid solves u once per distinct key timing (channels keyed together share it).
+#
+#   python CurveEval.py Animations --fps 60
+
+# Rate of the scenes the clips were made in: key times are frames at this rate.
+SCENE_FPS = 24.
+
+# Segments of the clips sampled in this session, dropped with their clip. A clip is not changed once read.
+clip_cache = weakref.WeakKeyDictionary()
+
+
+def correct_handles(x0, y0, x1, y1, x2, y2, x3, y3):
+
+	# Handles reaching past the other key are shortened, both by the same factor, so that x grows along the segment
+	# (Blender does the same before evaluating).
+	h1 = np.abs(x1 - x0)
+	h2 = np.abs(x3 - x2)
+	total = h1 + h2
+	length = x3 - x0
+	fac = np.where(total > length, length/np.where(total > 0., total, 1.), 1.)
+	return x0 + fac*(x1 - x0), y0 + fac*(y1 - y0), x3 + fac*(x2 - x3), y3 + fac*(y2 - y3)
+
+def cubic(p0, p1, p2, p3):
+
+	# (a, b, c) of the Bezier p0..p3 written ((a*u + b)*u + c)*u + p0
+	return p3 - p0 + 3.*(p1 - p2), 3.*(p0 - 2.*p1 + p2), 3.*(p1 - p0)
+
+
+class Segments():
+
+	# Segment k goes from key k to key k + 1 of the same curve. The last key of a curve starts no real segment: its
+	# row pairs it with the next curve's first key and is never used past the end value checks.
+	def __init__(self, times, data, counts, axes = None):
+
+		# times: (n,) key times and data: (n, 5) rows of (value, left x, left y, right x, right y) of all curves back
+		# to back, counts: keys per curve. axes: optional time axis index of each curve (as in a clip's toc), to find
+		# the curves sampled together. A curve without keys evaluates to 0.
+		t = np.asarray(times, dtype = np.float64)
+		d = np.asarray(data, dtype = np.float64).reshape(-1, KEY_FIELDS)
+		counts = np.asarray(counts, dtype = np.int64)
+		self.keyed = counts > 0
+		empty = np.flatnonzero(~self.keyed)
+		if len(empty):
+			at = (np.cumsum(counts) - counts)[empty]
+			t = np.insert(t, at, 0.)
+			d = np.insert(d, at, 0., axis = 0)
+			counts = np.maximum(counts, 1)
+		self.first = np.cumsum(counts) - counts
+		self.last = self.first + counts - 1
+		self.start_times = t[self.first]
+		self.end_times = t[self.last]
+
+		# Curve i is moved by i*span on the shared axis: the curves follow each other without overlapping.
+		span = t.max() - t.min() + 1.
+		self.offsets = np.arange(len(counts))*span - t.min()
+		self.axis = t + np.repeat(self.offsets, counts)
+
+		x0, y0 = t, d[:, 0]
+		x3, y3 = np.append(t[1:], t[-1]), np.append(d[1:, 0], d[-1, 0])
+		right = d[:, 3:5]
+		left = np.vstack((d[1:, 1:3], d[-1:, 1:3]))
+		x1, y1, x2, y2 = correct_handles(x0, y0, right[:, 0], right[:, 1], left[:, 0], left[:, 1], x3, y3)
+
+		self.x0, self.x3, self.y0, self.y3 = x0, x3, y0, y3
+		self.x = np.column_stack(cubic(x0, x1, x2, x3))
+		self.ya, self.yb, self.yc = cubic(y0, y1, y2, y3)
+
+		self.group = np.arange(len(counts))
+		if axes is not None:
+			axes = np.where(self.keyed, np.asarray(axes, dtype = np.int64), -1 - self.group)
+			self.group_curves(axes, np.column_stack((x1, x2)))
+		self.shared = np.unique(self.group)
+
+	def group_curves(self, axes, handles):
+
+		# Curves on the same time axis with the same handle x (most channels of a bone, often of a whole clip) share u
+		# at any time: sample solves it once per group, on its first curve. Each round, the curves of an axis are
+		# compared with the first one left, the differing ones go to the next round.
+		pending = np.arange(len(axes))
+		while len(pending):
+			labels, index, inverse = np.unique(axes[pending], return_index = True, return_inverse = True)
+			first = pending[index][inverse.ravel()]
+			sizes = (self.last - self.first)[pending]
+			owner = np.repeat(np.arange(len(pending)), sizes)
+			ramp = np.arange(len(owner)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+			rows = self.first[pending][owner] + ramp
+			reference = self.first[first][owner] + ramp
+			differs = np.bincount(owner, weights = (handles[rows] != handles[reference]).any(axis = 1), minlength = len(pending)) > 0
+			self.group[pending[~differs]] = first[~differs]
+			pending = pending[differs]
+
+	def __len__(self):
+		return len(self.first)
+
+	def frame_range(self):
+		return self.start_times[self.keyed].min(), self.end_times[self.keyed].max()
+
+	def find(self, curves, t):
+
+		# Segment under each (curve, time) query, times held to the curve's keys
+		t = np.clip(t, self.start_times[curves], self.end_times[curves])
+		k = np.searchsorted(self.axis, t + self.offsets[curves], side = 'right') - 1
+		return np.clip(k, self.first[curves], np.maximum(self.last[curves] - 1, self.first[curves])), t
+
+	def parameters(self, k, t, iterations = 16, tolerance = 1e-9):
+
+		# u in [0, 1] with x(u) = t: Newton steps, falling back to bisection when a step leaves the bracket.
+		# Only the queries not solved yet are iterated on.
+		x0 = self.x0[k]
+		a, b, c = self.x[k].T
+		length = self.x3[k] - x0
+		u = np.clip((t - x0)/np.where(length > 0., length, 1.), 0., 1.)
+		lo = np.zeros_like(u)
+		hi = np.ones_like(u)
+
+		active = np.arange(len(u))
+		for i in range(iterations):
+			v = u[active]
+			f = ((a[active]*v + b[active])*v + c[active])*v + x0[active] - t[active]
+			left = np.abs(f) >= tolerance
+			active, v, f = active[left], v[left], f[left]
+			if not len(active):
+				break
+			lo[active] = np.where(f < 0., v, lo[active])
+			hi[active] = np.where(f > 0., v, hi[active])
+			slope = (3.*a[active]*v + 2.*b[active])*v + c[active]
+			step = v - f/np.where(slope != 0., slope, 1.)
+			u[active] = np.where((slope != 0.) & (step > lo[active]) & (step < hi[active]), step, .5*(lo[active] + hi[active]))
+
+		return u
+
+	def evaluate(self, curves, times):
+
+		# Value of curve curves[i] at times[i], for all i at once.
+		k, t = self.find(np.asarray(curves, dtype = np.int64), np.asarray(times, dtype = np.float64))
+		return self.values(k, self.parameters(k, t), t >= self.x3[k], t <= self.x0[k])
+
+	def values(self, k, u, end, start):
+
+		# y of segments k at u. Exact end values where a key is hit (the start value last: a single key curve has
+		# no real segment).
+		values = ((self.ya[k]*u + self.yb[k])*u + self.yc[k])*u + self.y0[k]
+		values = np.where(end, self.y3[k], values)
+		return np.where(start, self.y0[k], values)
+
+	def sample(self, times):
+
+		# (curves, times) values of every curve at the same times
+		times = np.asarray(times, dtype = np.float64).ravel()
+		shared = np.repeat(self.shared, len(times))
+		k, t = self.find(shared, np.tile(times, len(self.shared)))
+		u = self.parameters(k, t)
+		end, start = t >= self.x3[k], t <= self.x0[k]
+
+		# Back to every curve: same u and end checks as its group, segments moved to its own keys
+		row = np.searchsorted(self.shared, self.group)
+		k = k.reshape(len(self.shared), -1)[row] + (self.first - self.first[self.group])[:, None]
+		shape = (len(self.shared), len(times))
+		return self.values(k, u.reshape(shape)[row], end.reshape(shape)[row], start.reshape(shape)[row])
+
+
+def evaluate_batch(curves):
+
+	# [(rows, times)] -> [values]: the segments under every query time of every curve are gathered, then solved together.
+	# A single key is a flat segment, no key evaluates to 0. Times outside the keys get the end values.
+	if not curves:
+		return []
+	rows = [np.asarray(r, dtype = np.float64).reshape(-1, 6) for r, times in curves]
+	times = [np.asarray(times, dtype = np.float64).ravel() for r, times in curves]
+	sizes = [len(t) for t in times]
+
+	block = np.concatenate(rows)
+	segments = Segments(block[:, 0], block[:, 1:], [len(r) for r in rows])
+	values = segments.evaluate(np.repeat(np.arange(len(rows)), sizes), np.concatenate(times))
+	return np.split(values, np.cumsum(sizes)[:-1])
+
+def evaluate(rows, times):
+
+	# Values of one curve at the given times (any shape).
+	times = np.asarray(times, dtype = np.float64)
+	return evaluate_batch([(rows, times)])[0].reshape(times.shape)
+
+def clip_channels(clip):
+
+	# (bone, channel) of every channel of a clip, in clip order
+	return [(bone, name) for bone, channels in clip.bones.items() for name in channels]
+
+def clip_segments(clip):
+
+	# Segments of every channel of a clip, from its blocks: interned time axes expanded to one time per key.
+	if clip not in clip_cache:
+		toc, axis_list, data = clip.layout()
+		entries = [e for bone, mode, bone_entries in toc['bones'] for e in bone_entries]
+		counts = np.array([e[2] for e in entries], dtype = np.int64)
+		axes = np.array([e[3] for e in entries], dtype = np.int64)
+		axis_starts = np.array([a[0] for a in toc['axes']] or [0], dtype = np.int64)
+		ramp = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		times = concatenate(axis_list, (0,))[np.repeat(axis_starts[axes], counts) + ramp]
+		clip_cache[clip] = Segments(times, concatenate(data, (0, KEY_FIELDS)), counts, axes)
+	return clip_cache[clip]
+
+def sample_frames(start, end, fps, scene_fps = SCENE_FPS, cover = False):
+
+	# Frames of a fixed rate grid from start, up to end (included when it falls on the grid).
+	# cover: up to the first grid frame at or past end instead.
+	step = scene_fps/float(fps)
+	steps = (end - start)/step
+	count = int(np.ceil(steps - 1e-6)) if cover else int(steps + 1e-6)
+	return start + np.arange(count + 1)*step
+
+def sample_clip(clip, fps = 60, scene_fps = SCENE_FPS):
+
+	# (frames, values) of every channel of a clip (clip_channels order) at a fixed rate over its frame range.
+	# values: (channels, frames) float64.
+	if not clip.n_keys:
+		return np.zeros(0), np.zeros((len(clip_channels(clip)), 0))
+	segments = clip_segments(clip)
+	frames = sample_frames(*segments.frame_range(), fps = fps, scene_fps = scene_fps)
+	return frames, segments.sample(frames)
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Sample every channel of every clip of a library at a fixed rate')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('--fps', type = float, default = 60.)
+	parser.add_argument('--scene-fps', type = float, default = SCENE_FPS, help = 'Rate the clips were keyed at')
+	args = parser.parse_args()
+
+	t0 = time.perf_counter()
+	clips = [read_clip(path, clip_name(args.folder, path)) for path in library_files(args.folder)]
+	t1 = time.perf_counter()
+	samples = [sample_clip(clip, args.fps, args.scene_fps)[1].size for clip in clips]
+	t2 = time.perf_counter()
+	for clip in clips:
+		sample_clip(clip, args.fps, args.scene_fps)
+	t3 = time.perf_counter()
+
+	print('{} clips, {} keys, {} samples at {:g} fps'.format(len(clips), sum(c.n_keys for c in clips), sum(samples), args.fps))
+	print('read {:.3f} s, sampled {:.3f} s ({:.3f} s with prepared segments)'.format(t1 - t0, t2 - t1, t3 - t2))
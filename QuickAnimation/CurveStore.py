@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from ClipFormat import Clip, Channel, read_clip, select_bones, encode_toc, KEY_DTYPE, KEY_FIELDS, KEY_SIZE, TIME_SIZE
+from ClipPack import library_files, clip_name
+
+# Content-addressed curve store: every distinct channel (its key times and keys) is stored once, under its hash.
+# A clip is only a manifest of hashes, so identical channels (tweak bones, flat channels, mirrored clips...)
+# are shared by every clip that uses them.
+#
+#   store/curves/ab/abcdef...   times (n float32) then keys (n x 5 float32), nothing else
+#   store/clips/Runs/SanRun.json   {'name', 'meta', 'bones': [[bone, mode, [[channel, hash], ...]], ...]}
+
+CURVE_FOLDER = 'curves'
+CLIP_FOLDER = 'clips'
+MANIFEST = '.json'
+
+# Decoded curves, shared by every store of the process, least recently used first. A hash always names the same content,
+# so entries never go stale, but they say nothing about what a store holds on disk: the cache only serves reads.
+# Arrays are read-only: channels of different clips can point to the same ones.
+curve_cache = OrderedDict()
+
+# Curves kept in curve_cache (the bundled library has 3738 distinct ones).
+CACHE_CURVES = 8192
+
+
+def curve_hash(times, data):
+
+	h = hashlib.sha1(np.ascontiguousarray(times, dtype = KEY_DTYPE).tobytes())
+	h.update(np.ascontiguousarray(data, dtype = KEY_DTYPE).tobytes())
+	return h.hexdigest()
+
+def read_only(array):
+
+	array.flags.writeable = False
+	return array
+
+def is_store(path):
+	return os.path.isdir(os.path.join(path, CURVE_FOLDER)) and os.path.isdir(os.path.join(path, CLIP_FOLDER))
+
+
+class CurveStore():
+
+	def __init__(self, path):
+
+		self.path = path
+		for folder in [CURVE_FOLDER, CLIP_FOLDER]:
+			if not os.path.isdir(os.path.join(path, folder)):
+				os.makedirs(os.path.join(path, folder))
+
+	def __contains__(self, name):
+		return os.path.isfile(self.manifest_path(name))
+
+	def curve_path(self, h):
+		return os.path.join(self.path, CURVE_FOLDER, h[:2], h)
+
+	def manifest_path(self, name):
+		return os.path.join(self.path, CLIP_FOLDER, name + MANIFEST)
+
+	def names(self):
+
+		root = os.path.join(self.path, CLIP_FOLDER)
+		return [clip_name(root, f)[:-len(MANIFEST)] for f in library_files(root) if f.endswith(MANIFEST)]
+
+	def has_curve(self, h):
+		return os.path.isfile(self.curve_path(h))
+
+	def put_curve(self, times, data):
+
+		# Returns the hash and whether the curve had to be written.
+		h = curve_hash(times, data)
+		if self.has_curve(h):
+			return h, False
+
+		path = self.curve_path(h)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+
+		# Written aside then renamed: a curve file is either complete or absent.
+		temp = path + '.tmp'
+		with open(temp, 'wb') as f:
+			f.write(np.ascontiguousarray(times, dtype = KEY_DTYPE).tobytes())
+			f.write(np.ascontiguousarray(data, dtype = KEY_DTYPE).tobytes())
+		os.replace(temp, path)
+		return h, True
+
+	def get_curve(self, h):
+
+		if h in curve_cache:
+			curve_cache.move_to_end(h)
+			return curve_cache[h]
+
+		with open(self.curve_path(h), 'rb') as f:
+			raw = f.read()
+
+		count = len(raw)//(TIME_SIZE + KEY_SIZE)
+		times = read_only(np.frombuffer(raw, dtype = KEY_DTYPE, count = count))
+		data = read_only(np.frombuffer(raw, dtype = KEY_DTYPE, offset = count*TIME_SIZE).reshape(-1, KEY_FIELDS))
+		curve_cache[h] = (times, data)
+		if len(curve_cache) > CACHE_CURVES:
+			curve_cache.popitem(last = False)
+		return times, data
+
+	def save(self, clip, name = None):
+
+		# Only the curves missing from the store are written, then the manifest, under name (by default the clip's own).
+		written = 0
+		reused = 0
+		bones = []
+		for bone, channels in clip.bones.items():
+			entries = []
+			for channel, c in channels.items():
+				h, new = self.put_curve(c.times, c.data)
+				written += new
+				reused += not new
+				entries.append([channel, h])
+			bones.append([bone, clip.modes[bone], entries])
+
+		path = self.manifest_path(clip.name if name is None else name)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(path, 'wb') as f:
+			f.write(encode_toc({'name':clip.name, 'meta':clip.meta, 'bones':bones}))
+
+		return {'written':written, 'reused':reused}
+
+	def manifest(self, name):
+
+		with open(self.manifest_path(name), 'rb') as f:
+			return json.loads(f.read().decode('utf-8'))
+
+	def load(self, name, bones = None):
+
+		# Channels are views on the cached curves: a curve shared by several clips is decoded once per process.
+		manifest = select_bones(self.manifest(name), bones)
+
+		clip = Clip(manifest['name'], manifest['meta'])
+		for bone, mode, entries in manifest['bones']:
+			clip.bones[bone] = OrderedDict()
+			clip.modes[bone] = mode
+			for channel, h in entries:
+				times, data = self.get_curve(h)
+				clip.bones[bone][channel] = Channel(channel, clip.intern(times), data)
+
+		return clip
+
+	def remove(self, name):
+		os.remove(self.manifest_path(name))
+
+	def collect(self):
+
+		# Deletes the curves no manifest refers to anymore.
+		used = set()
+		for name in self.names():
+			for bone, mode, entries in self.manifest(name)['bones']:
+				used.update(h for channel, h in entries)
+
+		removed = 0
+		for path in library_files(os.path.join(self.path, CURVE_FOLDER)):
+			h = os.path.basename(path)
+			if h not in used:
+				os.remove(path)
+				curve_cache.pop(h, None)
+				removed += 1
+
+		return removed
+
+	def size(self):
+		return sum(os.path.getsize(f) for f in library_files(self.path))
+
+
+def sync_library(folder, store):
+
+	# Adds every clip of a library folder (any format read_clip knows) to the store.
+	total = {'written':0, 'reused':0}
+	for source in library_files(folder):
+		name = clip_name(folder, source)
+		for suffix in ['.qclip', '.qclz']:
+			if name.endswith(suffix):
+				name = name[:-len(suffix)]
+
+		# Clip files keep the name they were saved with (often '' or a reused one): manifests go by path in the folder.
+		stats = store.save(read_clip(source, name), name)
+		print('{:<40} {:>5} curves written {:>5} reused'.format(name, stats['written'], stats['reused']))
+		total['written'] += stats['written']
+		total['reused'] += stats['reused']
+
+	return total
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Content-addressed curve store for animation clips')
+	parser.add_argument('folder', help = 'Library folder to add, e.g. Animations')
+	parser.add_argument('store', help = 'Store folder (created if needed)')
+	parser.add_argument('--collect', action = 'store_true', help = 'Delete curves no clip uses anymore')
+	args = parser.parse_args()
+
+	store = CurveStore(args.store)
+	total = sync_library(args.folder, store)
+	if args.collect:
+		print('{} unused curves removed'.format(store.collect()))
+
+	print('{} curves written, {} reused. Store size: {} bytes'.format(total['written'], total['reused'], store.size()))
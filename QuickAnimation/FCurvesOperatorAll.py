@@ -1,9 +1,15 @@
 import bpy
 import random 
 import mathutils as m 
-import math 
 import pickle
 
+import numpy as np
+
+from ClipFormat import load_pickle
+from CurveCore import legacy_path, read_keys, rest_curves, scale_rows
+from BlenderKeys import write_curves, reset_pose, key_bones
+from RigProfile import rig_profile
+
 
 class Humanoid(): 
 
@@ -12,26 +18,30 @@ class Humanoid():
         self.path = path
 
         self.armature = armature
-        self.footL = self.armature.pose.bones['Foot Control L']
-        self.footR = self.armature.pose.bones['Foot Control R']
-        self.handL = self.armature.pose.bones['IK Arm L']
-        self.handR = self.armature.pose.bones['IK Arm R']
-        self.head = self.armature.pose.bones['Head']
-        self.pelvis = self.armature.pose.bones['Pelvis']
-        self.spine1 = self.armature.pose.bones['Spine1']
-        self.spine2 = self.armature.pose.bones['Spine2']
 
-        self.legL = self.armature.pose.bones['Leg L']
-        self.legR = self.armature.pose.bones['Leg R']
+        # Bone order, rotation modes, arm/leg lengths and the pose bones come from the rig's profile, measured once per rig
+        self.profile = rig_profile(self.armature)
+        bones = self.profile.pose_bones
+        self.footL = bones['Foot Control L']
+        self.footR = bones['Foot Control R']
+        self.handL = bones['IK Arm L']
+        self.handR = bones['IK Arm R']
+        self.head = bones['Head']
+        self.pelvis = bones['Pelvis']
+        self.spine1 = bones['Spine1']
+        self.spine2 = bones['Spine2']
+
+        self.legL = bones['Leg L']
+        self.legR = bones['Leg R']
 
-        self.shouL = self.armature.pose.bones['Upperarm L']
-        self.shouR = self.armature.pose.bones['Upperarm R']
+        self.shouL = bones['Upperarm L']
+        self.shouR = bones['Upperarm R']
 
-        self.targetArmL = self.armature.pose.bones['IKT Arm L']
-        self.targetArmR = self.armature.pose.bones['IKT Arm R']
+        self.targetArmL = bones['IKT Arm L']
+        self.targetArmR = bones['IKT Arm R']
 
-        self.targetLegL = self.armature.pose.bones['IKT Leg L']
-        self.targetLegR = self.armature.pose.bones['IKT Leg R']
+        self.targetLegL = bones['IKT Leg L']
+        self.targetLegR = bones['IKT Leg R']
 
         self.bones = {
         'footL':self.footL,
@@ -48,47 +58,25 @@ class Humanoid():
         'targetAR':self.targetArmR
         }
 
-        leg_pos = self.armature.data.bones['Leg L'].head.z
-        foot_pos = self.armature.data.bones['Foot Control L'].head.z
-        hand_pos = self.armature.data.bones['Upperarm L'].head.x 
-        shoulder_pos = self.armature.data.bones['IK Arm L'].head.x
-
         # self.bones_names = [k.name for k in self.armature.data.bones] # PREVIOUS VERSION 
         
         # Here, we take into account only bones without other in their names
 
-        self.bones_names = [k.name for k in self.armature.pose.bones if "other" not in k.name]
+        self.bones_names = [k for k in self.profile.bones if "other" not in k]
 
-        self.arm_length = math.fabs(hand_pos - shoulder_pos)
-        self.leg_length = math.fabs(leg_pos - foot_pos)
+        self.arm_length = self.profile.arm_length
+        self.leg_length = self.profile.leg_length
 
         self.initial_pelvis_pos = self.pelvis.head.x
 
         self.leg_sensitive = ['Foot Control L', 'Foot Control R','IKT Leg L','IKT Leg R', 'Pelvis']
         self.arm_sensitive = ['IK Arm L','IK Arm R','IKT Arm L','IKT Arm R' ]
 
-    def select(self, bone): 
-
-        bpy.ops.pose.select_all(action = 'DESELECT')
-        self.armature.data.bones.active = self.armature.data.bones[bone.name]
-        self.armature.data.bones[bone.name].select = True
-
-    def select_from_name(self, bone_name): 
-
-        bpy.ops.pose.select_all(action = 'DESELECT')
-        self.armature.data.bones.active = self.armature.data.bones[bone_name]
-        self.armature.data.bones[bone_name].select = True
-
-    def select_index(self, nb): 
-
-        # Récuperer le nom de l'os. S'en servir pour le sélectionner. Je crois que c'est ce qui fait sauter le fait de plaquer les courbes.
-        name = self.bones_names[nb]
-
-        print('Selecting {}'.format(name))
-        bone = self.armature.pose.bones[name]
-        self.select(bone)
+    def reset(self): 
+        reset_pose(self.armature)
 
-        return name
+    def key(self, bone_names, frame): 
+        key_bones(self.armature, bone_names, frame)
 
     def get_curves(self): 
 
@@ -112,22 +100,13 @@ def set_frame(nb):
     bpy.context.scene.frame_current = nb
 
 
-def get_point(point, ratio):
-
-    current_point = [c/ratio for c in point.co]
-    left_handle = [c/ratio for c in point.handle_left]
-    right_handle = [c/ratio for c in point.handle_right]
-
-    return {'p':current_point, 'lh':left_handle, 'rh':right_handle}
-
 def get_curve(c, bone_nb, curve_number, ratio = 1.):
 
-    frames = [int(k.co.x) for k in c.keyframe_points]
-    all_points = []
-
-    for k in c.keyframe_points: 
-        all_points.append(get_point(k, ratio))
-
+    # One buffer read per attribute, then the dict layout of the old files
+    keys = read_keys(c, np.float64)
+    frames = keys[:, 0].astype(int).tolist()
+    rows = keys/ratio
+    all_points = [{'p':r[0:2], 'lh':r[2:4], 'rh':r[4:6]} for r in rows.tolist()]
 
     return {'points':all_points, 'frames':frames}
 
@@ -215,7 +194,7 @@ def save_dict(curves, armature, path):
 
 def load_dict(path_to_data, armature, name):
 
-    curves = pickle.load(open(path_to_data, 'rb'))
+    curves = load_pickle(path_to_data)
     current_leg_length = armature.leg_length
     current_arm_length = armature.arm_length
 
@@ -223,40 +202,16 @@ def load_dict(path_to_data, armature, name):
 
     print('Curves: {} -- Bones {}'.format(len(curves), len(curves)/7))
 
-    armature.create_action(name)
-
     # reset all 
-    bpy.ops.pose.select_all(action = 'SELECT')
-    bpy.ops.pose.loc_clear()
-    bpy.ops.pose.rot_clear()
-
-    set_frame(0)
-
-    bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = True)
-
+    armature.reset()
 
-    for bone in all_bones:
-
-        if bone in curves.keys():
-            frames_for_current_bone = curves[bone]['LocX']['frames']
-            armature.select_from_name(bone)
-            for f in frames_for_current_bone: 
-                set_frame(f)
-                bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = True)
-
-    source_curves = armature.get_curves()
- 
+    # Curves are written in bulk (BlenderKeys.py), bones missing from the file get a rest key at frame 0
+    action_curves = []
     ratio = 1.
-    for i,b in enumerate(all_bones):
+    for b in all_bones:
 
         if b in curves.keys(): 
-            # print('{} in dico'.format(b)) 
-
-            target_curves = curves[b]
             for j,entry in enumerate(curves[b]): 
-                actual_source_curve = source_curves[i*7 + j]
-                actual_target_curve = curves[b][entry]
-
                 if j<3: 
                     if b in armature.leg_sensitive: 
                         ratio = current_leg_length
@@ -265,19 +220,14 @@ def load_dict(path_to_data, armature, name):
                     else: 
                         ratio = 1.
 
-                for idx, kf in enumerate(actual_source_curve.keyframe_points): 
-                    ref = actual_target_curve['points'][idx]
-                    kf.co.y = ref['p'][1]*ratio
-                    kf.handle_left = m.Vector(ref['lh'])
-                    kf.handle_right = m.Vector(ref['rh'])
-
-                    kf.handle_left.y *= ratio
-                    kf.handle_right.y *= ratio
-                    kf.handle_left.x *= ratio
-                    kf.handle_right.x *= ratio
+                data_path, index = legacy_path(j)
+                action_curves.append((b, data_path, index, scale_rows([p['p'] + p['lh'] + p['rh'] for p in curves[b][entry]['points']], ratio)))
 
         else: 
             print('Bone {} did not exist'.format(b))
+            action_curves += rest_curves(b, 'QUATERNION')
+
+    write_curves(armature.armature, action_curves, name)
             
 def load_all(path_to_data, armature, name): 
 
@@ -290,36 +240,13 @@ def load_all(path_to_data, armature, name):
 
     print('Curves: {} -- Bones {}'.format(len(curves), len(curves)/7))
 
-    armature.create_action(name)
-    source_curves = armature.get_curves()
-
     # reset all 
-    bpy.ops.pose.select_all(action = 'SELECT')
-    bpy.ops.pose.loc_clear()
-    bpy.ops.pose.rot_clear()
-
-    set_frame(0)
-
-    # Add one frame for curves 
-
-    bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = True)
+    armature.reset()
 
-    # add frames for each curve 
+    # 7 curves per bone, written in bulk with their saved points and handles
 
-    for i in range(len(armature.bones_names)): 
-        index = i*7 # make sure to iterate well (7 curves per bone)
-        keyframes = curves[index]['frames']
-        name = armature.select_index(i)   # select bone for adding frames for the 7 curves in the same time 
-
-        for k in keyframes: 
-            set_frame(k)
-            bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__')
-
-    # Flat curves are set up. 
-    # Now, time to move the control points and handles 
-
-    courbe = 0 
-    for c_s, c_t in zip(source_curves, curves): 
+    action_curves = []
+    for courbe, c_t in enumerate(curves[:len(all_bones)*7]): 
         ratio = 1.
         current_bone = all_bones[int(courbe/7)]
         if courbe%7 <3: 
@@ -328,21 +255,11 @@ def load_all(path_to_data, armature, name):
             elif current_bone in armature.arm_sensitive: 
                 ratio = current_arm_length
 
+        rows = [ref['p'] + ref['lh'] + ref['rh'] for ref in c_t['points']]
+        data_path, index = legacy_path(courbe%7)
+        action_curves.append((current_bone, data_path, index, scale_rows(rows, ratio)))
 
-        for idx,kf in enumerate(c_s.keyframe_points):
-
-            ref = c_t['points'][idx]
-            kf.co.y = ref['p'][1]*ratio
-            kf.handle_left = m.Vector(ref['lh'])
-            kf.handle_right = m.Vector(ref['rh'])
-
-            kf.handle_left.y *= ratio
-            kf.handle_right.y *= ratio
-            kf.handle_left.x *= ratio
-            kf.handle_right.x *= ratio
-
-
-        courbe += 1 
+    write_curves(armature.armature, action_curves, name)
 
 class DialogOperator(bpy.types.Operator):
     bl_idname = "object.dialog_operator"
@@ -386,7 +303,12 @@ class DialogOperator(bpy.types.Operator):
         save_dict(curves, source_armature, full_path)
 
 
-bpy.utils.register_class(DialogOperator)
+def register(): 
+    bpy.utils.register_class(DialogOperator)
+
+
+if __name__ == '__main__': 
+    register()
 
-# test call
-bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test', saving = False)
\ No newline at end of file
+    # test call
+    bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test', saving = False)
\ No newline at end of file
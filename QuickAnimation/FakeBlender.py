@@ -0,0 +1,569 @@
+import sys
+import types
+from bisect import bisect_left
+from collections import OrderedDict
+
+# Stand-in for the parts of bpy and mathutils the animation scripts use, to run them under plain Python
+# (benchmarks, batch conversions). install() registers it as the bpy and mathutils modules.
+#
+# Armatures, actions and f-curves behave like Blender's for keying: keyframe_insert_menu keys the location and
+# rotation of the selected pose bones at the current frame, creating the f-curves (grouped by bone) the first time.
+# Operators nobody implemented here do nothing.
+#
+# The bulk API is there too: fcurves.new, keyframe_points.add and foreach_set/foreach_get on flat sequences.
+#
+# listeners: functions called with 'keyframe_insert' when keys are inserted or allocated, 'fcurves' when an action's
+# f-curves are read and 'keyframe_write' when keys are filled from buffers, so a caller can tell where a script is at
+# (see Benchmark.py).
+
+listeners = []
+
+def notify(event):
+	for listener in listeners:
+		listener(event)
+
+
+class Vector():
+
+	__slots__ = ['values']
+
+	def __init__(self, values = (0., 0., 0.)):
+		self.values = [float(v) for v in values]
+
+	def __len__(self):
+		return len(self.values)
+
+	def __iter__(self):
+		return iter(self.values)
+
+	def __getitem__(self, index):
+		return self.values[index]
+
+	def __setitem__(self, index, value):
+		if isinstance(index, slice):
+			self.values[index] = [float(v) for v in value]
+		else:
+			self.values[index] = float(value)
+
+	def __eq__(self, other):
+		return list(self) == list(other)
+
+	def __repr__(self):
+		return 'Vector({})'.format(tuple(self.values))
+
+	def copy(self):
+		return Vector(self.values)
+
+	@property
+	def x(self):
+		return self.values[0]
+
+	@x.setter
+	def x(self, value):
+		self.values[0] = float(value)
+
+	@property
+	def y(self):
+		return self.values[1]
+
+	@y.setter
+	def y(self, value):
+		self.values[1] = float(value)
+
+	@property
+	def z(self):
+		return self.values[2]
+
+	@z.setter
+	def z(self, value):
+		self.values[2] = float(value)
+
+	@property
+	def w(self):
+		return self.values[3]
+
+	@w.setter
+	def w(self, value):
+		self.values[3] = float(value)
+
+
+class Keyframe():
+
+	# Assigning co or a handle copies the values into the keyframe's own vectors, as in Blender.
+	__slots__ = ['_co', '_handle_left', '_handle_right']
+
+	def __init__(self, frame, value):
+
+		self._co = Vector((frame, value))
+		self._handle_left = Vector((frame - 1, value))
+		self._handle_right = Vector((frame + 1, value))
+
+	@property
+	def co(self):
+		return self._co
+
+	@co.setter
+	def co(self, value):
+		self._co[:] = value
+
+	@property
+	def handle_left(self):
+		return self._handle_left
+
+	@handle_left.setter
+	def handle_left(self, value):
+		self._handle_left[:] = value
+
+	@property
+	def handle_right(self):
+		return self._handle_right
+
+	@handle_right.setter
+	def handle_right(self, value):
+		self._handle_right[:] = value
+
+
+class Group():
+
+	def __init__(self, name):
+		self.name = name
+
+
+class KeyframePoints(list):
+
+	def __init__(self):
+
+		list.__init__(self)
+		self.frames = []
+
+	def insert(self, frame, value):
+
+		# Keys stay sorted by frame, a key on an existing frame replaces its value.
+		i = bisect_left(self.frames, frame)
+		if i < len(self.frames) and self.frames[i] == frame:
+			self[i].co.y = value
+			return self[i]
+
+		keyframe = Keyframe(frame, value)
+		self.frames.insert(i, frame)
+		list.insert(self, i, keyframe)
+		return keyframe
+
+	def add(self, count = 1):
+
+		# New keys at frame 0, to be moved with foreach_set as in Blender.
+		notify('keyframe_insert')
+		for i in range(count):
+			self.append(Keyframe(0., 0.))
+			self.frames.append(0.)
+
+	def foreach_set(self, attr, seq):
+
+		# seq: flat values, two per key (co, handle_left, handle_right).
+		notify('keyframe_write')
+		values = seq.tolist() if hasattr(seq, 'tolist') else list(seq)
+		if len(values) != 2*len(self):
+			raise RuntimeError('foreach_set: {} values for {} keys'.format(len(values), len(self)))
+		slot = '_' + attr
+		for i, k in enumerate(self):
+			getattr(k, slot).values = values[2*i:2*i + 2]
+		if attr == 'co':
+			self.frames = values[0::2]
+
+	def foreach_get(self, attr, seq):
+		seq[:] = [v for k in self for v in getattr(k, attr)]
+
+
+class FCurve():
+
+	def __init__(self, data_path, array_index, group):
+
+		self.data_path = data_path
+		self.array_index = array_index
+		self.group = group
+		self.keyframe_points = KeyframePoints()
+
+	def insert(self, frame, value):
+		return self.keyframe_points.insert(frame, value)
+
+	def update(self):
+
+		self.keyframe_points.sort(key = lambda k: k.co.x)
+		self.keyframe_points.frames = [k.co.x for k in self.keyframe_points]
+
+
+class FCurves(list):
+
+	def __init__(self, action):
+
+		list.__init__(self)
+		self.action = action
+
+	def __iter__(self):
+		notify('fcurves')
+		return list.__iter__(self)
+
+	def __getitem__(self, index):
+		notify('fcurves')
+		return list.__getitem__(self, index)
+
+	def new(self, data_path, index = 0, action_group = ''):
+
+		if (data_path, index) in self.action.paths:
+			raise RuntimeError('F-Curve \'{}[{}]\' already exists in action \'{}\''.format(data_path, index, self.action.name))
+		return self.action.fcurve(data_path, index, action_group)
+
+	def remove(self, fcurve):
+
+		list.remove(self, fcurve)
+		del self.action.paths[(fcurve.data_path, fcurve.array_index)]
+
+
+class Action():
+
+	def __init__(self, name):
+
+		self.name = name
+		self.fcurves = FCurves(self)
+		self.paths = {}
+
+	def fcurve(self, data_path, array_index, group_name):
+
+		key = (data_path, array_index)
+		if key not in self.paths:
+			c = FCurve(data_path, array_index, Group(group_name))
+			self.paths[key] = c
+			self.fcurves.append(c)
+		return self.paths[key]
+
+
+class AnimData():
+
+	def __init__(self):
+		self.action = None
+
+
+class Collection():
+
+	# Items by name or by index, iterated in creation order.
+	def __init__(self, items = ()):
+
+		self.items = OrderedDict((i.name, i) for i in items)
+		self.order = list(self.items.values())
+		self.active = None
+
+	def __getitem__(self, key):
+		return self.items[key] if isinstance(key, str) else self.order[key]
+
+	def __iter__(self):
+		return iter(self.order)
+
+	def __len__(self):
+		return len(self.order)
+
+	def __contains__(self, name):
+		return name in self.items
+
+	def get(self, name, default = None):
+		return self.items.get(name, default)
+
+	def keys(self):
+		return list(self.items.keys())
+
+	def values(self):
+		return list(self.order)
+
+	def add(self, item):
+
+		self.items[item.name] = item
+		self.order.append(item)
+		return item
+
+
+class Bone():
+
+	def __init__(self, name, head = (0., 0., 0.), tail = (0., 1., 0.), parent = None):
+
+		self.name = name
+		self.head = Vector(head)
+		self.tail = Vector(tail)
+		self.parent = parent
+		self.select = False
+		self.use_inherit_rotation = True
+		self.use_local_location = True
+		self.use_inherit_scale = True
+
+	@property
+	def matrix_local(self):
+
+		# Armature space rest matrix: bones point along their own y axis, without roll.
+		y = [t - h for h, t in zip(self.head, self.tail)]
+		length = sum(v*v for v in y)**.5
+		y = [v/length for v in y]
+		x = [y[1], -y[0], 0.] if abs(y[2]) < .999 else [1., 0., 0.]
+		norm = sum(v*v for v in x)**.5
+		x = [v/norm for v in x]
+		z = [x[1]*y[2] - x[2]*y[1], x[2]*y[0] - x[0]*y[2], x[0]*y[1] - x[1]*y[0]]
+		return [[x[i], y[i], z[i], self.head[i]] for i in range(3)] + [[0., 0., 0., 1.]]
+
+
+class PoseBone():
+
+	def __init__(self, name, rotation_mode = 'QUATERNION', head = (0., 0., 0.)):
+
+		self.name = name
+		self.rotation_mode = rotation_mode
+		self.head = Vector(head)
+		self.location = Vector((0., 0., 0.))
+		self.rotation_quaternion = Vector((1., 0., 0., 0.))
+		self.rotation_euler = Vector((0., 0., 0.))
+		self.rotation_axis_angle = Vector((0., 0., 1., 0.))
+		self.scale = Vector((1., 1., 1.))
+		self.constraints = []
+		self.id_data = None
+
+	@property
+	def rotation_path(self):
+
+		if self.rotation_mode == 'QUATERNION':
+			return 'rotation_quaternion'
+		if self.rotation_mode == 'AXIS_ANGLE':
+			return 'rotation_axis_angle'
+		return 'rotation_euler'
+
+	def keyframe_insert(self, data_path, index = -1, frame = None, group = ''):
+
+		obj = self.id_data
+		obj.animation_data_create()
+		if obj.animation_data.action is None:
+			obj.animation_data.action = bpy.data.actions.new(name = '{}Action'.format(obj.name))
+		frame = bpy.context.scene.frame_current if frame is None else frame
+		values = getattr(self, data_path)
+		for i in range(len(values)) if index < 0 else [index]:
+			obj.animation_data.action.fcurve(bone_path(self.name, data_path), i, group or self.name).insert(frame, values[i])
+		return True
+
+	def keyed_values(self):
+
+		# (data path, values) of the channels keyed by keyframe_insert_menu.
+		return [('location', self.location), (self.rotation_path, getattr(self, self.rotation_path))]
+
+
+class Armature():
+
+	def __init__(self, name, bones):
+
+		self.name = name
+		self.bones = Collection(bones)
+
+	def as_pointer(self):
+		return id(self)
+
+
+class Pose():
+
+	def __init__(self, bones):
+		self.bones = Collection(bones)
+
+
+class Object():
+
+	def __init__(self, name, data = None, pose = None):
+
+		self.name = name
+		self.data = data
+		self.pose = pose
+		self.animation_data = None
+		self.location = Vector((0., 0., 0.))
+
+	def as_pointer(self):
+		return id(self)
+
+	def animation_data_create(self):
+
+		if self.animation_data is None:
+			self.animation_data = AnimData()
+		return self.animation_data
+
+
+def bone_path(bone, data_path):
+	return 'pose.bones["{}"].{}'.format(bone, data_path)
+
+def make_armature(bones, modes = None, heads = None, name = 'Armature', tails = None, parents = None):
+
+	# Armature object with the given bones, registered in bpy.data.objects and made the active object.
+	# parents: {bone: parent name}, parents listed before their children.
+	modes = modes or {}
+	heads = heads or {}
+	tails = tails or {}
+	parents = parents or {}
+	data = Armature(name, [])
+	for b in bones:
+		head = heads.get(b, (0., 0., 0.))
+		tail = tails.get(b, (head[0], head[1] + 1., head[2]))
+		data.bones.add(Bone(b, head, tail, data.bones.get(parents.get(b))))
+	pose = Pose([PoseBone(b, modes.get(b, 'QUATERNION'), heads.get(b, (0., 0., 0.))) for b in bones])
+	obj = Object(name, data, pose)
+	for pose_bone in pose.bones:
+		pose_bone.id_data = obj
+	bpy.data.objects[name] = obj
+	bpy.context.object = obj
+	bpy.context.active_object = obj
+	return obj
+
+def add_fcurve(obj, bone, data_path, array_index, rows):
+
+	# Keys a curve directly from (frame, value, left x, left y, right x, right y) rows, without going through the operators.
+	obj.animation_data_create()
+	if obj.animation_data.action is None:
+		obj.animation_data.action = bpy.data.actions.new(name = 'Action')
+
+	c = obj.animation_data.action.fcurve(bone_path(bone, data_path), array_index, bone)
+	for row in rows:
+		keyframe = c.insert(row[0], row[1])
+		keyframe.handle_left = row[2:4]
+		keyframe.handle_right = row[4:6]
+	return c
+
+
+# Operators
+
+def finished(*args, **kwargs):
+	return {'FINISHED'}
+
+def select_all(action = 'TOGGLE'):
+
+	bones = bpy.context.object.data.bones
+	select = action == 'SELECT' or (action == 'TOGGLE' and not any(b.select for b in bones))
+	for b in bones:
+		b.select = select
+	return {'FINISHED'}
+
+def keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False, always_prompt = False):
+
+	notify('keyframe_insert')
+	obj = bpy.context.object
+	obj.animation_data_create()
+	if obj.animation_data.action is None:
+		obj.animation_data.action = bpy.data.actions.new(name = '{}Action'.format(obj.name))
+
+	action = obj.animation_data.action
+	frame = bpy.context.scene.frame_current
+	for pose_bone in obj.pose.bones:
+		if not obj.data.bones[pose_bone.name].select:
+			continue
+		for data_path, values in pose_bone.keyed_values():
+			path = bone_path(pose_bone.name, data_path)
+			for index, value in enumerate(values):
+				action.fcurve(path, index, pose_bone.name).insert(frame, value)
+
+	return {'FINISHED'}
+
+
+class OpsModule():
+
+	def __init__(self, **operators):
+		self.__dict__.update(operators)
+
+	def __getattr__(self, name):
+		return finished
+
+
+class Ops():
+
+	def __getattr__(self, name):
+
+		module = OpsModule()
+		setattr(self, name, module)
+		return module
+
+
+class Actions(dict):
+
+	# Iterates actions, not names, as Blender's collections do.
+	def __iter__(self):
+		return iter(list(self.values()))
+
+	def new(self, name):
+
+		action = Action(name)
+		self[name] = action
+		return action
+
+
+class Scene():
+
+	def __init__(self):
+		self.frame_current = 0
+
+	def frame_set(self, frame):
+		self.frame_current = frame
+
+
+class Operator():
+
+	def report(self, kind, message):
+		print('{} {}'.format(kind, message))
+
+
+# Properties are class attributes in Blender 2.7: the fake ones just hold their default value.
+
+def BoolProperty(name = '', default = False, **kwargs):
+	return default
+
+def StringProperty(name = '', default = '', **kwargs):
+	return default
+
+def FloatProperty(name = '', default = 0., **kwargs):
+	return default
+
+def IntProperty(name = '', default = 0, **kwargs):
+	return default
+
+def FloatVectorProperty(name = '', default = (0., 0., 0.), size = 3, **kwargs):
+	return tuple(default)[:size]
+
+def EnumProperty(items = (), name = '', default = None, **kwargs):
+	return default if default is not None or not items else items[0][0]
+
+
+def make_bpy():
+
+	module = types.ModuleType('bpy')
+	module.data = types.SimpleNamespace(objects = {}, actions = Actions(), filepath = '')
+	module.context = types.SimpleNamespace(scene = Scene(), object = None, active_object = None)
+	module.ops = Ops()
+	module.ops.pose = OpsModule(select_all = select_all)
+	module.ops.anim = OpsModule(keyframe_insert_menu = keyframe_insert_menu)
+	module.types = types.SimpleNamespace(Operator = Operator)
+	module.props = types.SimpleNamespace(BoolProperty = BoolProperty, StringProperty = StringProperty,
+		FloatProperty = FloatProperty, FloatVectorProperty = FloatVectorProperty, IntProperty = IntProperty, EnumProperty = EnumProperty)
+	module.utils = types.SimpleNamespace(register_class = finished, unregister_class = finished)
+	return module
+
+def make_mathutils():
+
+	module = types.ModuleType('mathutils')
+	module.Vector = Vector
+	return module
+
+def reset():
+
+	# Empties the scene: no object, no action, frame 0.
+	bpy.data.objects.clear()
+	bpy.data.actions.clear()
+	bpy.context.scene.frame_current = 0
+	bpy.context.object = None
+	bpy.context.active_object = None
+
+def install():
+
+	# Registers the fake modules, unless a real bpy is already there. Returns bpy.
+	if 'bpy' not in sys.modules:
+		sys.modules['bpy'] = bpy
+		sys.modules['mathutils'] = mathutils
+	return sys.modules['bpy']
+
+
+bpy = make_bpy()
+mathutils = make_mathutils()
@@ -0,0 +1,196 @@
+import numpy as np
+
+# Forward kinematics of an armature without Blender, for whole animations at once (arrays of n frames).
+#
+# rest: {bone: (parent name or None, 4x4 matrix_local)}, the armature space rest matrices of data.bones.
+# A pose bone's matrix (armature space) is, as Blender builds it for bones without constraints:
+#   root:   matrix_local @ basis
+#   child:  parent matrix @ (parent matrix_local^-1 @ matrix_local) @ basis
+# with basis = translation(location) @ rotation @ scale.
+#
+# Rotations follow Blender's conventions: quaternions are (w, x, y, z), euler orders name the first axis applied first
+# ('XYZ' is Rz @ Ry @ Rx), axis angles are (angle, x, y, z).
+
+EPSILON = 1e-8
+
+# Euler order -> (first axis, parity) of the static frame conventions used by matrix_eulers.
+EULER_ORDERS = {'XYZ':(0, 0), 'XZY':(0, 1), 'YXZ':(1, 1), 'YZX':(1, 0), 'ZXY':(2, 0), 'ZYX':(2, 1)}
+NEXT_AXIS = [1, 2, 0, 1]
+
+
+def quaternion_matrices(q):
+
+	q = np.asarray(q, dtype = np.float64).reshape(-1, 4)
+	q = q/np.maximum(np.linalg.norm(q, axis = 1), EPSILON)[:, None]
+	w, x, y, z = q.T
+	return np.stack([
+		np.stack([1. - 2.*(y*y + z*z), 2.*(x*y - w*z), 2.*(x*z + w*y)], -1),
+		np.stack([2.*(x*y + w*z), 1. - 2.*(x*x + z*z), 2.*(y*z - w*x)], -1),
+		np.stack([2.*(x*z - w*y), 2.*(y*z + w*x), 1. - 2.*(x*x + y*y)], -1)], 1)
+
+def axis_matrices(axis, angles):
+
+	c = np.cos(angles)
+	s = np.sin(angles)
+	m = np.zeros((len(angles), 3, 3))
+	i, j = (axis + 1) % 3, (axis + 2) % 3
+	m[:, axis, axis] = 1.
+	m[:, i, i] = c
+	m[:, j, j] = c
+	m[:, j, i] = s
+	m[:, i, j] = -s
+	return m
+
+def euler_matrices(e, order = 'XYZ'):
+
+	e = np.asarray(e, dtype = np.float64).reshape(-1, 3)
+	axes = ['XYZ'.index(a) for a in order]
+	m = axis_matrices(axes[0], e[:, axes[0]])
+	for axis in axes[1:]:
+		m = np.matmul(axis_matrices(axis, e[:, axis]), m)
+	return m
+
+def axis_angle_matrices(a):
+
+	a = np.asarray(a, dtype = np.float64).reshape(-1, 4)
+	axis = a[:, 1:]/np.maximum(np.linalg.norm(a[:, 1:], axis = 1), EPSILON)[:, None]
+	half = .5*a[:, 0]
+	return quaternion_matrices(np.column_stack((np.cos(half), axis*np.sin(half)[:, None])))
+
+def rotation_matrices(values, mode):
+
+	if mode == 'QUATERNION':
+		return quaternion_matrices(values)
+	if mode == 'AXIS_ANGLE':
+		return axis_angle_matrices(values)
+	return euler_matrices(values, mode)
+
+def matrix_quaternions(m):
+
+	# Rotation matrices (n, 3, 3) to unit quaternions, kept on the same hemisphere from one frame to the next
+	# so that interpolating between keys does not take the long way.
+	m = np.asarray(m, dtype = np.float64).reshape(-1, 3, 3)
+	trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+	candidates = np.stack([
+		np.stack([1. + trace, m[:, 2, 1] - m[:, 1, 2], m[:, 0, 2] - m[:, 2, 0], m[:, 1, 0] - m[:, 0, 1]], -1),
+		np.stack([m[:, 2, 1] - m[:, 1, 2], 1. + m[:, 0, 0] - m[:, 1, 1] - m[:, 2, 2], m[:, 0, 1] + m[:, 1, 0], m[:, 0, 2] + m[:, 2, 0]], -1),
+		np.stack([m[:, 0, 2] - m[:, 2, 0], m[:, 0, 1] + m[:, 1, 0], 1. - m[:, 0, 0] + m[:, 1, 1] - m[:, 2, 2], m[:, 1, 2] + m[:, 2, 1]], -1),
+		np.stack([m[:, 1, 0] - m[:, 0, 1], m[:, 0, 2] + m[:, 2, 0], m[:, 1, 2] + m[:, 2, 1], 1. - m[:, 0, 0] - m[:, 1, 1] + m[:, 2, 2]], -1)], 1)
+
+	# The candidate built on the largest diagonal term is the stable one.
+	best = np.argmax(np.stack([trace, m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], -1), axis = 1)
+	q = candidates[np.arange(len(m)), best]
+	q /= np.linalg.norm(q, axis = 1)[:, None]
+	q[q[:, 0] < 0.] *= -1.
+	return make_continuous(q)
+
+def make_continuous(q):
+
+	q = np.array(q, dtype = np.float64)
+	if len(q) > 1:
+		flips = np.cumsum(np.einsum('ij,ij->i', q[1:], q[:-1]) < 0.) % 2
+		q[1:][flips == 1] *= -1.
+	return q
+
+def matrix_eulers(m, order = 'XYZ'):
+
+	m = np.asarray(m, dtype = np.float64).reshape(-1, 3, 3)
+	first, parity = EULER_ORDERS[order]
+	i = first
+	j = NEXT_AXIS[i + parity]
+	k = NEXT_AXIS[i - parity + 1]
+
+	cy = np.sqrt(m[:, i, i]**2 + m[:, j, i]**2)
+	regular = cy > EPSILON
+	a = np.where(regular, np.arctan2(m[:, k, j], m[:, k, k]), np.arctan2(-m[:, j, k], m[:, j, j]))
+	b = np.arctan2(-m[:, k, i], cy)
+	c = np.where(regular, np.arctan2(m[:, j, i], m[:, i, i]), 0.)
+	if parity:
+		a, b, c = -a, -b, -c
+
+	# a, b, c are the angles of the first, second and third axes of the order.
+	e = np.zeros((len(m), 3))
+	e[:, i] = a
+	e[:, j] = b
+	e[:, k] = c
+	return e
+
+def matrix_axis_angles(m):
+
+	q = matrix_quaternions(m)
+	angle = 2.*np.arccos(np.clip(q[:, 0], -1., 1.))
+	s = np.sqrt(np.maximum(1. - q[:, 0]**2, 0.))
+	axis = np.where(s[:, None] > EPSILON, q[:, 1:]/np.maximum(s, EPSILON)[:, None], [0., 1., 0.])
+	return np.column_stack((angle, axis))
+
+def matrix_rotations(m, mode):
+
+	if mode == 'QUATERNION':
+		return matrix_quaternions(m)
+	if mode == 'AXIS_ANGLE':
+		return matrix_axis_angles(m)
+	return matrix_eulers(m, mode)
+
+def basis_matrices(location, rotation, mode, scale = None):
+
+	# (n, 4, 4) local transforms of a pose bone from its channel values.
+	rotation = rotation_matrices(rotation, mode)
+	m = np.zeros((len(rotation), 4, 4))
+	m[:, :3, :3] = rotation
+	if scale is not None:
+		m[:, :3, :3] *= np.asarray(scale, dtype = np.float64).reshape(-1, 1, 3)
+	m[:, :3, 3] = np.asarray(location, dtype = np.float64).reshape(-1, 3)
+	m[:, 3, 3] = 1.
+	return m
+
+def decompose(m):
+
+	# Location, rotation matrix and scale of (n, 4, 4) transforms (no shear).
+	m = np.asarray(m, dtype = np.float64).reshape(-1, 4, 4)
+	scale = np.linalg.norm(m[:, :3, :3], axis = 1)
+	rotation = m[:, :3, :3]/np.maximum(scale, EPSILON)[:, None, :]
+	return m[:, :3, 3].copy(), rotation, scale
+
+def offset_matrix(location = (0., 0., 0.), rotation = (0., 0., 0.), order = 'XYZ'):
+
+	# 4x4 transform from a location and an euler rotation (radians).
+	m = np.eye(4)
+	m[:3, :3] = euler_matrices(rotation, order)[0]
+	m[:3, 3] = location
+	return m
+
+def chain(rest, bone):
+
+	# Bones from the root down to bone.
+	bones = []
+	while bone is not None:
+		bones.append(bone)
+		bone = rest[bone][0]
+	return bones[::-1]
+
+def rest_offset(rest, bone):
+
+	# Rest transform of a bone in its parent's space.
+	parent, matrix = rest[bone]
+	if parent is None:
+		return np.asarray(matrix, dtype = np.float64)
+	return np.linalg.solve(np.asarray(rest[parent][1], dtype = np.float64), matrix)
+
+def pose_matrices(rest, bone, bases, frames = 1):
+
+	# (n, 4, 4) armature space matrices of a pose bone. bases: {bone: (n, 4, 4)}, bones missing from it are at rest.
+	m = np.tile(np.eye(4), (frames, 1, 1))
+	for b in chain(rest, bone):
+		m = np.matmul(m, rest_offset(rest, b))
+		if b in bases:
+			m = np.matmul(m, bases[b])
+	return m
+
+def pose_to_basis(rest, bone, matrices, parent_matrices = None):
+
+	# Inverse of pose_matrices for one bone: the basis giving it these armature space matrices,
+	# parent_matrices being its parent's (what assigning pose_bone.matrix does in Blender).
+	m = np.asarray(matrices, dtype = np.float64)
+	if rest[bone][0] is not None:
+		m = np.linalg.solve(parent_matrices, m)
+	return np.linalg.solve(np.broadcast_to(rest_offset(rest, bone), m.shape), m)
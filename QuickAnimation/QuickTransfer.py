@@ -1,11 +1,18 @@
 import bpy 
-import math 
-import mathutils as m 
-import pickle 
 
+from ClipFormat import save_clip, read_clip
+from ClipPack import Pack, is_pack_file
+from BoneGroups import resolve_bones
+from ClipCodec import save_compressed, MIN_ERROR
+from CurveStore import CurveStore, is_store
+from CurveCore import get_curve, curves_to_clip, convert_rotations
+from BlenderKeys import write_curves, reset_pose, key_bones
+from RigProfile import rig_profile, find_profile, blend_file
+from Retarget import profile_chains, retarget
+from BoneRemap import compile_mapping, mapped_curves, load_tables, add_table
+from BoneMatch import match_rigs, MATCH_FILE
 
-quat_dict = {0:'LocX', 1:'LocY', 2:'LocZ', 3:'QW', 4:'QX', 5:'QY', 6:'QZ' }
-xyz_dict = {0:'LocX', 1:'LocY', 2:'LocZ', 3:'EX', 4:'EY', 5:'EZ'}
+# Blender side only: the curve logic is in CurveCore.py, which runs without Blender.
 
 class Rig: 
 
@@ -30,139 +37,103 @@ class Rig:
 	def pose(self): 
 		return self.rig.pose
 
-	def select_from_name(self, bone_name): 
+	@property
+	def chains(self): 
+		# Limb chain lengths, see Retarget.py
+		return profile_chains(rig_profile(self.rig).data)
 
-		bpy.ops.pose.select_all(action = 'DESELECT')
-		self.rig.data.bones.active = self.rig.data.bones[bone_name]
-		self.rig.data.bones[bone_name].select = True
+	def reset(self): 
+		reset_pose(self.rig)
 
-        # print('Selecting: {}'.format(bone_name))
+	def key(self, bone_names, frame): 
+		key_bones(self.rig, bone_names, frame)
 
 
 def set_frame(nb): 
     bpy.context.scene.frame_current = nb
 
 
-def get_point(point, ratio):
-
-    current_point = [c/ratio for c in point.co]
-    left_handle = [c/ratio for c in point.handle_left]
-    right_handle = [c/ratio for c in point.handle_right]
-
-    return {'p':current_point, 'lh':left_handle, 'rh':right_handle}
-
-def get_curve(c, ratio = 1.):
-
-    frames = [int(k.co.x) for k in c.keyframe_points]
-    all_points = []
-
-    for k in c.keyframe_points: 
-        all_points.append(get_point(k, ratio))
-
-
-    return {'points':all_points, 'frames':frames}
-
-
-def get_infos(curve, rig): 
+def rotation_modes(rig): 
+	return {b.name:b.rotation_mode for b in rig.pose.bones}
 
-	name = curve.group.name
-	mode = rig.pose.bones[name].rotation_mode
-	dico = quat_dict if mode == 'QUATERNION' else xyz_dict
+def save_dict(rig, path, name = '', errors = None, store = None): 
 
-	return name, mode, dico
-
-def save_dict(rig, path): 
+	# errors: optional maximum error per channel type ({'location':..., 'quaternion':...}). Saves a compressed clip.
+	# store: optional CurveStore. Only the curves it does not have yet are written.
 
 	curves = rig.curves 
 
-	data = {}
-
-	current_name, current_mode, current_dico = get_infos(curves[0], rig)
-
-	data[current_name] = {}
-	curve_counter = 0
-
-	for i,c in enumerate(curves): 
-
-		if c.group.name != current_name: 
-			current_name, current_mode, current_dico = get_infos(c, rig)
-			curve_counter = 0 
-			data[current_name] = {}
+	clip = curves_to_clip([(c.group.name, get_curve(c)) for c in curves], rotation_modes(rig), name)
+	clip.meta['chains'] = dict(rig.chains)
+	clip.meta['rig'] = rig_profile(rig.rig).hash
 
-		print('Bone {} in mode {} with curve counter: {}'.format(current_name, current_mode, curve_counter))
+	if store is not None: 
+		stats = store.save(clip)
+		print('{} curves written, {} already in the store'.format(stats['written'], stats['reused']))
+	elif errors: 
+		save_compressed(clip, path, errors)
+	else: 
+		save_clip(clip, path)
+	print('Data saved for {} bones'.format(len(clip.bones)))
 
-		data[current_name][current_dico[curve_counter]] = get_curve(c)
-
-		curve_counter += 1 
-
-	pickle.dump(data, open(path, 'wb'))
-	print('Data saved for {} bones'.format(len(data.keys())))
-
-def load_dict(curves, rig, name = 'LastAnimation'):
+def load_dict(clip, rig, name = 'LastAnimation', bones = None, scale = True, remap = None):
    
-	concerned_bones = list(curves.keys())
-
-	rig.create_action(name)
-
-	bpy.ops.pose.select_all(action = 'SELECT')
-	bpy.ops.pose.loc_clear()
-	bpy.ops.pose.rot_clear()
-
-	set_frame(0)
-	bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
-
-	for bone in concerned_bones:
-
-		print(bone)
-
-		if bone in rig.all_bones:
-			frames_for_current_bone = curves[bone]['LocX']['frames']
-			rig.select_from_name(bone)
-			for f in frames_for_current_bone: 
-			    set_frame(f)
-			    try: 
-			        bpy.ops.anim.keyframe_insert_menu(type = '__ACTIVE__', confirm_success = False)
-			    except RuntimeError: 
-			        print('Bone : {} could not be found'.format(bone))
-
-	source_curves = rig.curves
-
-	ratio = 1.
-
-	curve_counter = 0 
-	current_name, current_mode, current_dico = get_infos(source_curves[0], rig) 
-	for s_c in zip(source_curves):
-
-		# print(s_c[0].group.name)
-		actual_source_curve = s_c[0]
-
-		if actual_source_curve.group.name != current_name: 
-			current_name, current_mode, current_dico = get_infos(actual_source_curve, rig)
-			curve_counter = 0 
-
-		if current_name in list(curves.keys()):
-			actual_target_curve = curves[current_name][current_dico[curve_counter]]
-
-			for idx, kf in enumerate(actual_source_curve.keyframe_points): 
-			    ref = actual_target_curve['points'][idx]
-			    kf.co.y = ref['p'][1]*ratio
-			    kf.handle_left = m.Vector(ref['lh'])
-			    kf.handle_right = m.Vector(ref['rh'])
-
-			    kf.handle_left.y *= ratio
-			    kf.handle_right.y *= ratio
-			    kf.handle_left.x *= ratio
-			    kf.handle_right.x *= ratio
-
-		curve_counter += 1 
+	# bones: optional mask (bone names, groups from BoneGroups or patterns). Only those bones are keyed,
+	# the other bones of the rig get a rest key at frame 0. Curves are written in bulk (BlenderKeys.py).
+	# scale: locations are scaled to the rig's limbs, for clips saved with their rig's measurements.
+	# remap: name of a BoneRemap table, for rigs whose bones are named differently.
+	if scale and clip.meta.get('chains'): 
+		clip = retarget(clip, rig.chains)
+
+	sources = list(clip.bones.keys())
+	rig_bones = rig.all_bones
+	mapping = compile_mapping(remap, sources, rig_bones)
+	concerned = set(resolve_bones(sources, bones))
+
+	# Bones keep the rig's rotation mode: rotations saved in another mode (or euler order) are converted to it.
+	modes = {}
+	for bone, source in zip(rig_bones, mapping):
+		if source >= 0 and sources[source] in concerned:
+			modes[sources[source]] = rig.pose.bones[bone].rotation_mode
+	keyed = set(modes)
+	clip = convert_rotations(clip, modes)
+
+	rig.reset()
+
+	curves = mapped_curves(clip, [(b.name, b.rotation_mode) for b in rig.pose.bones], mapping, concerned)
+	write_curves(rig.rig, curves, name)
+	print('Loaded {} curves for {} bones'.format(len(curves), len(keyed)))
+	if len(keyed) < len(concerned): 
+		print('{} bones of the clip have no bone on this rig'.format(len(concerned) - len(keyed)))
+
+def matched_remap(clip, rig, source = None):
+
+	# Name of a remap table pairing the clip's rig with this one by shape (BoneMatch.py), solved once per pair of rigs.
+	# The clip's rig is the source object if given, else the profile the clip was saved with. None when it is unknown here.
+	source_profile = rig_profile(source) if source is not None else find_profile(clip.meta.get('rig', ''))
+	if source_profile is None: 
+		print('The rig {} was saved on is not profiled here: bones are matched by name'.format(clip.name))
+		return None
+
+	target_profile = rig_profile(rig.rig)
+	table = match_rigs(source_profile.data, target_profile.data, blend_file(MATCH_FILE))
+	return add_table('match {} {}'.format(source_profile.hash[:8], target_profile.hash[:8]), table)
 
 class DialogOperator(bpy.types.Operator):
     bl_idname = "object.dialog_operator"
     bl_label = "Save/Load animation"
 
     saving = bpy.props.BoolProperty(name="Save ? Else load.")
-    path_to_anim = bpy.props.StringProperty(name="Path to folder")
+    path_to_anim = bpy.props.StringProperty(name="Path to folder (or pack file, or curve store)")
     anim_name = bpy.props.StringProperty(name="Animation name:")
+    bone_mask = bpy.props.StringProperty(name="Bones to load (names or groups, empty for all)")
+    compress = bpy.props.BoolProperty(name="Compress when saving")
+    location_error = bpy.props.FloatProperty(name="Max location error", default = 1e-4, min = MIN_ERROR, precision = 6)
+    rotation_error = bpy.props.FloatProperty(name="Max rotation error", default = 1e-4, min = MIN_ERROR, precision = 6)
+    scale_to_rig = bpy.props.BoolProperty(name="Scale to this rig's limbs", default = True)
+    remap_table = bpy.props.StringProperty(name="Bone remap table (name, or json file, empty for none)")
+    match_bones = bpy.props.BoolProperty(name="Match bones by shape (instead of a table)")
+    source_rig = bpy.props.StringProperty(name="Rig the clip was made on (object, empty for the saved profile)")
     # path_to_anim += "/home/mehdi/Blender/Scripts/"
 
     def execute(self, context):
@@ -183,12 +154,30 @@ class DialogOperator(bpy.types.Operator):
         wm = context.window_manager
         return wm.invoke_props_dialog(self)
 
-    def launch_load(self): 
+    def load_clip(self): 
+        if is_pack_file(self.path_to_anim): 
+            # The file is closed on the way out, the map once the clip's views are gone
+            with Pack(self.path_to_anim) as pack: 
+                return pack.clip(self.anim_name, self.bone_mask)
+        if is_store(self.path_to_anim): 
+            return CurveStore(self.path_to_anim).load(self.anim_name, self.bone_mask)
         full_path = self.path_to_anim + self.anim_name
-        curves = pickle.load(open(full_path, 'rb'))
+        return read_clip(full_path, self.anim_name, self.bone_mask)
+
+    def remap(self): 
+        # A json file brings its own tables, the first one is used
+        if self.remap_table.endswith('.json'): 
+            return load_tables(self.remap_table)[0]
+        return self.remap_table or None
+
+    def launch_load(self): 
+        clip = self.load_clip()
         target_armature = Rig(bpy.data.objects['Armature'])
         # load_all(full_path, target_armature, 'LastLoaded')
-        load_dict(curves, target_armature, 'LastLoaded')
+        remap = self.remap()
+        if self.match_bones: 
+            remap = matched_remap(clip, target_armature, bpy.data.objects[self.source_rig] if self.source_rig else None)
+        load_dict(clip, target_armature, 'LastLoaded', self.bone_mask, self.scale_to_rig, remap)
 
     def launch_save(self): 
 
@@ -196,10 +185,20 @@ class DialogOperator(bpy.types.Operator):
         source_armature = Rig(bpy.data.objects['Armature'])
         # curves = source_armature.curves
         # save_all(curves, source_armature,full_path)
-        save_dict(source_armature, full_path)
+        errors = None
+        if self.compress: 
+            errors = {'location':self.location_error, 'quaternion':self.rotation_error, 'euler':self.rotation_error}
+        store = CurveStore(self.path_to_anim) if is_store(self.path_to_anim) else None
+        save_dict(source_armature, full_path, self.anim_name, errors, store)
+
+
+def register(): 
+    bpy.utils.register_class(DialogOperator)
 
 
-bpy.utils.register_class(DialogOperator)
+# Only when run as a script (Blender's text editor): importing this module has no side effect.
+if __name__ == '__main__': 
+    register()
 
-# test call
-bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test', saving = False)
\ No newline at end of file
+    # test call
+    bpy.ops.object.dialog_operator('INVOKE_DEFAULT', path_to_anim = '/home/mehdi/Bureau/', anim_name = 'Test', saving = False)
\ No newline at end of file
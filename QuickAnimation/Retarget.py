@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import time
+
+from collections import OrderedDict
+
+import numpy as np
+
+from BoneGroups import resolve_bones
+from ClipFormat import Clip, read_clip, save_clip, concatenate, KEY_DTYPE, KEY_FIELDS
+from CurveCore import channel_paths, map_library
+
+# Per chain retargeting, without bpy. Each limb chain is measured on a rig (sum of the rest lengths of its deform bones,
+# from the rig's profile, see RigProfile.py). Saved clips keep the measurements of the rig they were made on
+# (clip.meta['chains']). On load, the location keys of the bones a chain moves (IK controls, torso...) are scaled
+# by target length/source length: values and both handle heights, for the whole clip in one operation on its key block.
+# Rotations and key times are left alone.
+
+# chain: (bones measured, bones moved), as names, patterns or BoneGroups groups. A bone moves with the first chain listing it.
+CHAINS = OrderedDict([
+	('arm.L', (['DEF-upper_arm.L*', 'DEF-forearm.L*', 'DEF-hand.L'], ['arm.L'])),
+	('arm.R', (['DEF-upper_arm.R*', 'DEF-forearm.R*', 'DEF-hand.R'], ['arm.R'])),
+	('leg.L', (['DEF-thigh.L*', 'DEF-shin.L*', 'DEF-foot.L'], ['leg.L'])),
+	('leg.R', (['DEF-thigh.R*', 'DEF-shin.R*', 'DEF-foot.R'], ['leg.R'])),
+	('fingers.L', (['DEF-f_*.L', 'DEF-thumb.*.L'], ['fingers.L'])),
+	('fingers.R', (['DEF-f_*.R', 'DEF-thumb.*.R'], ['fingers.R'])),
+	('spine', (['DEF-spine*'], ['spine.upper'])),
+	# The hips ride on the legs: root, torso and hips locations follow the leg length.
+	('legs', (['DEF-thigh.*', 'DEF-shin.*'], ['spine.lower'])),
+])
+
+# Default chain lengths of the profiles measured in this session, by profile hash.
+profile_lengths = {}
+
+
+def chain_lengths(profile, chains = CHAINS):
+
+	# {chain: length} of a rig profile's data (RigProfile.data). Chains without any bone on the rig are left out.
+	lengths = dict(zip(profile['bones'], profile['bone_lengths']))
+	measured = OrderedDict()
+	for chain, (measure, moved) in chains.items():
+		bones = resolve_bones(profile['bones'], measure)
+		if bones:
+			measured[chain] = sum(lengths[b] for b in bones)
+	return measured
+
+def profile_chains(profile):
+
+	if profile['hash'] not in profile_lengths:
+		profile_lengths[profile['hash']] = chain_lengths(profile)
+	return profile_lengths[profile['hash']]
+
+def bone_ratios(bones, source, target, chains = CHAINS):
+
+	# {bone: target/source length} for the bones moved by a chain measured on both rigs
+	ratios = {}
+	for chain, (measure, moved) in chains.items():
+		if source.get(chain) and target.get(chain):
+			for b in resolve_bones(bones, moved):
+				ratios.setdefault(b, target[chain]/source[chain])
+	return ratios
+
+def retarget(clip, target, source = None, chains = CHAINS):
+
+	# Copy of the clip scaled from its own chain lengths (source for clips saved without them) to the target ones.
+	# A clip without measurements, or already at the target's proportions, comes back as it is.
+	source = clip.meta.get('chains') or source
+	if not source:
+		return clip
+
+	ratios = bone_ratios(list(clip.bones.keys()), source, target, chains)
+	if all(r == 1. for r in ratios.values()):
+		return clip
+
+	toc, axis_list, data = clip.layout()
+	keys = concatenate(data, (0, KEY_FIELDS))
+
+	# One ratio per channel, expanded to its keys (the layout puts channels back to back)
+	scales = []
+	counts = []
+	for bone, mode, entries in toc['bones']:
+		for name, start, count, axis in entries:
+			scales.append(ratios.get(bone, 1.) if channel_paths[name][0] == 'location' else 1.)
+			counts.append(count)
+	scale = np.repeat(np.array(scales, dtype = KEY_DTYPE), counts)
+
+	# value, left handle y, right handle y
+	keys[:, 0::2] *= scale[:, None]
+
+	toc['meta'] = dict(toc['meta'], chains = dict(target))
+	return Clip.from_blocks(toc, concatenate(axis_list, (0,)), keys)
+
+def retarget_task(path, name, output, target, source = None):
+
+	# Runs in a worker process (see CurveCore.map_library)
+	t0 = time.perf_counter()
+	clip = read_clip(path, name)
+	t1 = time.perf_counter()
+	retargeted = retarget(clip, target, source)
+	t2 = time.perf_counter()
+
+	destination = os.path.join(output, name + '.qclip')
+	os.makedirs(os.path.dirname(destination), exist_ok = True)
+	save_clip(retargeted, destination)
+
+	return {
+		'source':path,
+		'target':destination,
+		'keys':clip.n_keys,
+		'scaled':retargeted is not clip,
+		'read':t1 - t0,
+		'retarget':t2 - t1,
+		'save':time.perf_counter() - t2,
+	}
+
+def retarget_library(folder, output, target, source = None, workers = None):
+	return map_library(retarget_task, folder, (output, target, source), workers)
+
+def load_lengths(path, rig = None):
+
+	# Chain lengths from a json file: either {chain: length}, or rig profiles (rig_profiles.json, next to a .blend).
+	# rig: start of the profile hash, when the file holds several.
+	data = json.load(open(path))
+	if not all(isinstance(v, dict) for v in data.values()):
+		return data
+
+	found = [p for key, p in data.items() if rig is None or key.startswith(rig)]
+	if len(found) != 1:
+		raise ValueError('{} profiles in {} match {}, give more of the hash'.format(len(found), path, rig))
+	return chain_lengths(found[0])
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'Scale a whole animation library to the limbs of another rig')
+	parser.add_argument('folder', help = 'Library folder, e.g. Animations')
+	parser.add_argument('output', help = 'Folder receiving the retargeted clips')
+	parser.add_argument('--target', required = True, help = 'Chain lengths or rig profiles (json) of the new character')
+	parser.add_argument('--target-rig', help = 'Hash of the target profile, if the file holds several')
+	parser.add_argument('--source', help = 'Chain lengths or rig profiles of the rig the clips were made on, for clips without measurements')
+	parser.add_argument('--source-rig', help = 'Hash of the source profile, if the file holds several')
+	parser.add_argument('--workers', type = int, default = None)
+	args = parser.parse_args()
+
+	target = load_lengths(args.target, args.target_rig)
+	source = load_lengths(args.source, args.source_rig) if args.source else None
+
+	t0 = time.perf_counter()
+	results = retarget_library(args.folder, args.output, target, source, args.workers)
+	elapsed = time.perf_counter() - t0
+
+	failed = [r for r in results if 'error' in r]
+	for r in failed:
+		print('{:<50} FAILED {}'.format(r['source'], r['error']))
+	done = [r for r in results if 'error' not in r]
+	print('{} clips, {} keys, {} scaled, {} failed in {:.2f} s'.format(len(results), sum(r['keys'] for r in done),
+		len([r for r in done if r['scaled']]), len(failed), elapsed))
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+
+import bpy
+import numpy as np
+
+from CurveCore import rest_values, rotation_path
+
+# What the scripts need to know about a rig, measured once: bone order and index, parents, rest matrices
+# (armature space), heads, bone lengths, rotation modes, the channels each bone is keyed on and the arm/leg lengths.
+# A profile is named by a hash of the rest data it comes from, and saved in rig_profiles.json next to the .blend: a rig
+# edited in edit mode (or a bone changing rotation mode) gets a new hash, so a saved profile never goes stale.
+# In the session, the profile of an armature is found again from its object, data and bone names (armature_key),
+# without reading the rest data: only a miss measures and hashes it. It also holds the armature's pose bones by name.
+
+PROFILE_FILE = 'rig_profiles.json'
+
+# Part of the hash: profiles saved by an older version are measured again rather than read with missing fields.
+PROFILE_VERSION = 2
+
+# Bones the humanoid arm and leg lengths are measured on (see humanoid_lengths).
+length_bones = ['Upperarm L', 'IK Arm L', 'Leg L', 'Foot Control L']
+
+# Profiles of the session, by hash, and by armature (see armature_key).
+profiles = {}
+armature_profiles = {}
+
+
+def rest_data(armature):
+
+	# [name, parent, rest matrix, head, tail, rotation mode] per bone, in the armature's order.
+	rows = []
+	for bone in armature.data.bones:
+		rows.append([bone.name, bone.parent.name if bone.parent else None,
+			[list(row) for row in bone.matrix_local], list(bone.head), list(bone.tail),
+			armature.pose.bones[bone.name].rotation_mode])
+	return rows
+
+def armature_key(armature):
+
+	# Cheap fingerprint of an armature: bones added, removed or renamed make a new key, moving them in edit mode does not
+	# (the profile is measured again in the next session). Pointers, so that a new object of the same name is measured.
+	return (armature.as_pointer(), armature.data.as_pointer(), tuple(armature.data.bones.keys()))
+
+def rest_hash(rows):
+	return hashlib.sha1(json.dumps([PROFILE_VERSION, rows], separators = (',', ':')).encode('utf-8')).hexdigest()
+
+def bone_channels(mode):
+
+	# (data path, index) of the keyed channels of a bone: location, then its rotation
+	path = rotation_path(mode)
+	return [('location', i) for i in range(3)] + [(path, i) for i in range(len(rest_values[path]))]
+
+def humanoid_lengths(heads):
+
+	# (arm, leg) as Humanoid always measured them: heads in parent space, so the upper arm's x is its
+	# offset from the shoulder. None on rigs without these bones.
+	if not all(b in heads for b in length_bones):
+		return None
+	arm = abs(heads['Upperarm L'][0] - heads['IK Arm L'][0])
+	leg = abs(heads['Leg L'][2] - heads['Foot Control L'][2])
+	return [arm, leg]
+
+def build_profile(rows, key):
+
+	names = [r[0] for r in rows]
+	return {
+		'hash':key,
+		'bones':names,
+		'parents':[names.index(r[1]) if r[1] is not None else -1 for r in rows],
+		'rest':[r[2] for r in rows],
+		'heads':[r[3] for r in rows],
+		'bone_lengths':[float(np.linalg.norm(np.subtract(r[4], r[3]))) for r in rows],
+		'modes':[r[5] for r in rows],
+		'channels':[bone_channels(r[5]) for r in rows],
+		'lengths':humanoid_lengths({r[0]:r[3] for r in rows}),
+	}
+
+def blend_file(name, folder = None):
+
+	# A file in the folder, by default next to the .blend. None while the .blend has never been saved.
+	if folder is None:
+		if not bpy.data.filepath:
+			return None
+		folder = os.path.dirname(bpy.data.filepath)
+	return os.path.join(folder, name)
+
+def profile_file(folder = None):
+	return blend_file(PROFILE_FILE, folder)
+
+def load_profiles(path):
+
+	if path is None or not os.path.isfile(path):
+		return {}
+	return json.load(open(path))
+
+def save_profile(profile, path):
+
+	saved = load_profiles(path)
+	saved[profile.hash] = profile.data
+	with open(path, 'w') as f:
+		json.dump(saved, f, separators = (',', ':'))
+
+def rig_profile(armature, folder = None):
+
+	# Profile of the armature: from the session, else from the profile file, else measured (and saved).
+	# Only the first call for an armature reads its rest data.
+	armature_id = armature_key(armature)
+	if armature_id not in armature_profiles:
+		rows = rest_data(armature)
+		key = rest_hash(rows)
+		if key not in profiles:
+			path = profile_file(folder)
+			saved = load_profiles(path)
+			if key in saved:
+				profiles[key] = RigProfile(saved[key])
+			else:
+				profiles[key] = RigProfile(build_profile(rows, key))
+				if path is not None:
+					save_profile(profiles[key], path)
+				print('Profiled {}: {} bones, {}'.format(armature.name, len(rows), key[:8]))
+		armature_profiles[armature_id] = RigProfile(profiles[key].data, armature)
+	return armature_profiles[armature_id]
+
+def find_profile(key, folder = None):
+
+	# Profile of a hash met before, in this session or saved in the profile file. None if unknown.
+	if key not in profiles:
+		saved = load_profiles(profile_file(folder))
+		if key not in saved:
+			return None
+		profiles[key] = RigProfile(saved[key])
+	return profiles[key]
+
+
+class RigProfile():
+
+	# armature: the rig the profile was measured on, whose pose bones are resolved once (pose_bones). None for a profile
+	# found by hash.
+	def __init__(self, data, armature = None):
+
+		self.data = data
+		self.hash = data['hash']
+		self.bones = data['bones']
+		self.index = {name:i for i, name in enumerate(self.bones)}
+		self.parents = {name:self.bones[p] if p >= 0 else None for name, p in zip(self.bones, data['parents'])}
+		self.rest = np.array(data['rest'])
+		self.heads = np.array(data['heads'])
+		self.bone_lengths = dict(zip(self.bones, data['bone_lengths']))
+		self.modes = dict(zip(self.bones, data['modes']))
+		self.channels = {name:[tuple(c) for c in channels] for name, channels in zip(self.bones, data['channels'])}
+		self.arm_length, self.leg_length = data['lengths'] or (None, None)
+		self.pose_bones = {b.name:b for b in armature.pose.bones} if armature is not None else {}
+
+	def __contains__(self, name):
+		return name in self.index
+
+	def rest_matrix(self, name):
+		return self.rest[self.index[name]]
+
+	def head_local(self, name):
+		return self.rest[self.index[name], :3, 3]
+
+	def head(self, name):
+		return self.heads[self.index[name]]